@@ -0,0 +1,202 @@
+"""
+Throughput benchmarks for the generation and parsing pipeline.
+
+Every measurement is appended as one JSON line to the results file, tagged with the
+git commit, the Python version and a run id, so runs can be compared over time:
+
+    python benchmark.py --results bench_results.jsonl
+    python benchmark.py --only parse entities
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset"))
+
+import sample_games
+from acg import TextWorldACG
+from agents.walkthrough import WalkthroughAgent
+from utils.files import get_games_list
+from utils.parse import EntityMatcher, get_state_entities, parse_game_state
+
+BENCHMARKS = ["generation", "cooking", "walk", "parse", "entities", "load"]
+
+
+class Recorder:
+    def __init__(self, results_file):
+        self.results_file = results_file
+        self.run = {
+            "run_id": time.strftime("%Y%m%dT%H%M%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        }
+
+    def record(self, benchmark, metric, value, unit, **params):
+        result = dict(self.run, benchmark=benchmark, metric=metric, value=value, unit=unit, params=params)
+        print("{:<12} {:<22} {:>14.3f} {}".format(benchmark, metric, value, unit))
+        with open(self.results_file, "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_generation(recorder, output, nb_games, seed, challenge=None):
+    if challenge is None:
+        name = "generation"
+        argv = ["custom", "--output", output, "--seed", str(seed), "--nb_games", str(nb_games), "--force"]
+    else:
+        name = "cooking"
+        argv = ["challenge", challenge, "--output", output, "--seed", str(seed),
+                "--nb_games", str(nb_games), "--force"]
+    args = sample_games.parse_args(argv)
+    _, make_fn = sample_games.GENERATORS[args.subcommand]
+
+    start = time.perf_counter()
+    for i in range(seed, seed + nb_games):
+        make_fn(args, i)
+    elapsed = time.perf_counter() - start
+
+    recorder.record(name, "games_per_sec", nb_games / elapsed, "games/s", nb_games=nb_games, seed=seed)
+
+
+def bench_walk(recorder, games_dir):
+    games = sorted(get_games_list(games_dir))
+    dataset = TextWorldACG.partial()
+    agent = WalkthroughAgent()
+
+    steps = 0
+    start = time.perf_counter()
+    for game in games:
+        steps += dataset.walk_game(game, agent)
+    elapsed = time.perf_counter() - start
+
+    recorder.record("walk", "games_per_sec", len(games) / elapsed, "games/s", nb_games=len(games))
+    recorder.record("walk", "steps_per_sec", steps / elapsed, "steps/s", nb_games=len(games), steps=steps)
+    return dataset
+
+
+def _synthetic_state(rng, nb_entities):
+    words = ["red", "old", "wooden", "metal", "chest", "box", "key", "door", "table", "lamp", "book", "apple"]
+    entities = sorted(set(" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(nb_entities)))
+    kinds = ["container", "supporter", "object", "door", "key", "food"]
+    entities = [(ent, rng.choice(kinds)) for ent in entities]
+
+    mentioned = rng.sample(entities, len(entities) // 3)
+    description = "-= Kitchen =- You are in a kitchen. " + " ".join(
+        "There is a {} here.".format(ent) for ent, _ in mentioned) + " There is an exit to the north."
+    commands = ["look", "inventory"] + ["take {}".format(ent) for ent, _ in mentioned] + ["go north"]
+    game_state = SimpleNamespace(description=description, inventory="You are carrying nothing.",
+                                 admissible_commands=commands)
+    return game_state, entities
+
+
+def bench_parse(recorder, iterations, seed):
+    game_state, _ = _synthetic_state(random.Random(seed), 40)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse_game_state(game_state)
+    elapsed = time.perf_counter() - start
+    recorder.record("parse", "parse_game_state", iterations / elapsed, "calls/s", iterations=iterations)
+
+
+def bench_entities(recorder, iterations, seed):
+    for nb_entities in (10, 50, 200):
+        game_state, entities = _synthetic_state(random.Random(seed), nb_entities)
+        state = (game_state.description + game_state.inventory).lower()
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            get_state_entities(entities, state)
+        elapsed = time.perf_counter() - start
+        recorder.record("entities", "get_state_entities", iterations / elapsed, "calls/s",
+                        iterations=iterations, nb_entities=len(entities))
+
+        matcher = EntityMatcher(entities)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            matcher.match(state)
+        elapsed = time.perf_counter() - start
+        recorder.record("entities", "matcher.match", iterations / elapsed, "calls/s",
+                        iterations=iterations, nb_entities=len(entities))
+
+
+def bench_load(recorder, file_name):
+    params = dict(file_name=os.path.basename(file_name), size=os.path.getsize(file_name))
+
+    start = time.perf_counter()
+    dataset = TextWorldACG(file_name=file_name, save_data=False)
+    elapsed = time.perf_counter() - start
+    recorder.record("load", "load_time", elapsed, "s", records=len(dataset), **params)
+
+    start = time.perf_counter()
+    for idx in range(len(dataset)):
+        dataset[idx]
+    elapsed = time.perf_counter() - start
+    recorder.record("load", "getitem_per_sec", len(dataset) / max(elapsed, 1e-9), "items/s", **params)
+    del dataset
+
+    tracemalloc.start()
+    dataset = TextWorldACG(file_name=file_name, save_data=False)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    recorder.record("load", "peak_memory", peak / 2 ** 20, "MiB", records=len(dataset), **params)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark game generation, walking and parsing.")
+    parser.add_argument("--results", default="bench_results.jsonl",
+                        help="JSON lines file the results are appended to. Default: %(default)s")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS,
+                        help="Benchmarks to run. Default: all")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--nb_games", type=int, default=20,
+                        help="Nb. of games generated (then walked). Default: %(default)s")
+    parser.add_argument("--iterations", type=int, default=20000,
+                        help="Nb. of calls for the micro-benchmarks. Default: %(default)s")
+    parser.add_argument("--dataset", nargs="*", default=[],
+                        help="Dataset files to measure the load time and memory of.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    recorder = Recorder(args.results)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        games_dir = os.path.join(tmpdir, "custom", "")
+        if "generation" in args.only or "walk" in args.only:
+            bench_generation(recorder, games_dir, args.nb_games, args.seed)
+        if "cooking" in args.only:
+            bench_generation(recorder, os.path.join(tmpdir, "cooking", ""), args.nb_games, args.seed,
+                             challenge="tw-cooking-level1")
+
+        if "walk" in args.only:
+            dataset = bench_walk(recorder, games_dir)
+            for file_name in ("walked.json", "walked.zbin"):
+                file_name = os.path.join(tmpdir, file_name)
+                dataset.save(file_name)
+                args.dataset.append(file_name)
+
+        if "parse" in args.only:
+            bench_parse(recorder, args.iterations, args.seed)
+        if "entities" in args.only:
+            bench_entities(recorder, args.iterations, args.seed)
+
+        if "load" in args.only:
+            for file_name in args.dataset:
+                bench_load(recorder, file_name)
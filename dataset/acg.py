@@ -1,40 +1,169 @@
 import os
 import json
-import textworld
-from tqdm import tqdm
+import random
+import argparse
+import functools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 
-from agents.walkthrough import WalkthroughAgent, WalkthroughDone
+# TextWorld, the agents and tqdm are only imported where games get parsed,
+# so that loading a dataset needs nothing more than reader.py.
+from reader import load_pairs
+from utils.catalog import parse_condition
+from utils.dedup import DiskIndex, MemoryIndex
 from utils.files import get_games_list
-from utils.parse import get_state_entities, parse_game_state
+from utils.parse import get_entity_matcher, get_state_key, parse_game_state
+from utils.profiling import WalkProfiler
+from utils.stream import StreamingDataset
+from utils.supervise import Quarantine, Supervisor
+from utils.binary import write_binary, write_compressed
+from utils.tokenize import file_fingerprint, tokenize_dataset
+from utils.vocab import InternedPairs
+from utils.writer import ShardWriter
 
 
 class TextWorldACG:
     def __init__(self, games_dir='../tw_games/',
                  file_name='../data/train.text.dataset.json',
-                 save_data=True):
+                 save_data=True, workers=1, shard_dir=None, checkpoint_every=100,
+                 intern=False, profile=False, profile_file=None, recycle_every=None,
+                 fast=False, check_rate=0.01, batch_size=1, shard_index=0, num_shards=1,
+                 where=(), sample=None, timeout=None, retries=1, quarantine_file=None, explore=None,
+                 index_file=None, index_cache=100000):
         """
 
         :param games_dir: directory for all the generated games
+        :param workers: number of processes walking games in parallel
+        :param shard_dir: if given, parsed games are streamed to JSONL shards in this directory
+                          and an interrupted parse resumes from its last checkpoint
+        :param checkpoint_every: number of shard writes between two checkpoints
+        :param intern: keep actions, entities and previous actions as ids into shared vocab tables
+        :param profile: time every phase of walk_game and print a summary once all games are parsed
+        :param profile_file: export the per-game timings to this .json or .csv file (implies profile)
+        :param recycle_every: replace each parse worker process after it walked this many chunks of games
+        :param fast: walk games on their logic state instead of running them in the interpreter
+                     (see utils.simulate.LogicEnvironment)
+        :param check_rate: in fast mode, fraction of games also played in the interpreter to check
+                           that their admissible commands and texts match
+        :param batch_size: number of games each process walks in lockstep (see walk_games_batched)
+        :param shard_index: only parse the shard_index-th of num_shards contiguous slices of the sorted
+                            game list (merge the shards' shard_dir with merge_shards.py)
+        :param where: only parse the games whose catalog entry satisfies these predicates
+                      (see utils.catalog.parse_condition)
+        :param sample: only parse this many games, drawn at random (before sharding)
+        :param timeout: walk every game in a child process killed after this many seconds
+                        (see utils.supervise.Supervisor). Games that keep failing are skipped and quarantined
+        :param retries: nb. of times a game that timed out or raised is walked again before it is quarantined
+        :param quarantine_file: JSON lines of the quarantined games, skipped by later runs
+                                (defaults to file_name with a .quarantine.jsonl extension)
+        :param explore: explore games with an agents.explore.ExplorationAgent built with these keyword
+                        arguments (max_depth, max_breadth, max_states) instead of following their walkthrough
+        :param index_file: deduplicate states through a utils.dedup.DiskIndex in this SQLite file instead of
+                           in memory, keeping only index_cache records in memory
         """
         super(TextWorldACG, self).__init__()
         self.games_dir = games_dir
         self.file_name = file_name
 
         self.save_data = save_data
+        self.workers = workers
+        self.shard_dir = shard_dir
+        self.checkpoint_every = checkpoint_every
+        self.intern = intern
+        self.profile_file = profile_file
+        self.recycle_every = recycle_every
+        self.fast = fast
+        self.check_rate = check_rate
+        self.batch_size = batch_size
+        self.shard_index = shard_index
+        self.num_shards = num_shards
+        self.where = where
+        self.sample = sample
+        self.timeout = timeout
+        self.retries = retries
+        if quarantine_file is None:
+            quarantine_file = os.path.splitext(file_name)[0] + '.quarantine.jsonl'
+        self.quarantine_file = quarantine_file
+        self.failures = {}
+        self.explore = explore
+        self.profiler = WalkProfiler() if profile or profile_file else None
+        self.cross_checks = {}
 
-        self.state_action_pairs = []
-        self.state_mappings = {}
-        self.counter = 0
+        self.index_file = index_file
+        self.index_cache = index_cache
+        self.index = MemoryIndex()
+        self.state_action_pairs = self.index.pairs
 
         if os.path.isfile(self.file_name):
-            with open(self.file_name) as f:
-                self.state_action_pairs = json.load(f)
+            self.load(self.file_name)
         else:
             self.parse_all_games(self.games_dir)
+            if self.intern:
+                self.state_action_pairs = InternedPairs(self.state_action_pairs)
+                # The interned pairs replace the index's, which would otherwise keep every raw pair alive.
+                self.index.close()
+                self.index = MemoryIndex()
 
             if self.save_data:
-                with open(self.file_name, 'w') as outfile:
-                    json.dump(self.state_action_pairs, outfile)
+                self.save(self.file_name)
+
+    def load(self, file_name):
+        """
+        Loads a saved dataset. Binary datasets are memory-mapped and decoded lazily.
+        """
+        self.state_action_pairs = load_pairs(file_name, intern=self.intern)
+
+    def save(self, file_name):
+        """
+        Saves the dataset, in the binary format if file_name ends with .bin, in the compressed
+        binary format if it ends with .zbin and as JSON otherwise.
+        """
+        if file_name.endswith('.bin') or file_name.endswith('.zbin'):
+            compress = file_name.endswith('.zbin')
+            if isinstance(self.state_action_pairs, InternedPairs):
+                self.state_action_pairs.save(file_name, compress=compress)
+            elif compress:
+                write_compressed(self.state_action_pairs, file_name)
+            else:
+                write_binary(self.state_action_pairs, file_name)
+        else:
+            with open(file_name, 'w') as outfile:
+                json.dump(list(self.state_action_pairs), outfile)
+
+    def tokenize(self, cache_dir='../data/tokens/', tokenizer=None, max_len=None):
+        """
+        Tokenizes the dataset into padded NumPy arrays (see utils.tokenize.encode_pairs).
+        Results are cached in cache_dir, keyed by the vocabulary and the dataset file's hash.
+        :param tokenizer: vocabulary to use, built from the dataset if None
+        :return: the tokenizer and a dict of arrays
+        """
+        dataset_hash = file_fingerprint(self.file_name) if os.path.isfile(self.file_name) else None
+        return tokenize_dataset(self.state_action_pairs, cache_dir, tokenizer=tokenizer,
+                                dataset_hash=dataset_hash, max_len=max_len)
+
+    @classmethod
+    def stream(cls, sources, **kwargs):
+        """
+        Iterates over batches of a saved dataset (or parse shards) without loading it in memory.
+        See utils.stream.StreamingDataset for the options (batch size, shuffle buffer, worker sharding...).
+        """
+        return StreamingDataset(sources, **kwargs)
+
+    @classmethod
+    def partial(cls, profiler=None, fast=False, check_rate=0.0):
+        """
+        Creates an empty dataset that neither loads nor parses anything.
+        Parse workers walk their games into one of these.
+        """
+        dataset = cls.__new__(cls)
+        dataset.profiler = profiler
+        dataset.fast = fast
+        dataset.check_rate = check_rate
+        dataset.cross_checks = {}
+        dataset.index = MemoryIndex()
+        dataset.state_action_pairs = dataset.index.pairs
+        return dataset
 
     def __getitem__(self, idx):
         return self.state_action_pairs[idx]
@@ -46,17 +175,192 @@ class TextWorldACG:
         """
         Walks through and parses all in given directory (self.games_dir)
         """
+        from tqdm import tqdm
 
         print("Parsing all games into state/action pairs")
-        ulx_files = get_games_list(games_dir)
+        if self.index_file is not None:
+            self.index = DiskIndex(self.index_file, cache_size=self.index_cache)
+            self.state_action_pairs = self.index.pairs
+        ulx_files = get_games_list(games_dir, where=self.where, sample=self.sample,
+                                   shard_index=self.shard_index, num_shards=self.num_shards)
+        quarantine = None
+        if self.timeout is not None:
+            quarantine = Quarantine(self.quarantine_file)
+            quarantined = [game for game in ulx_files if game in quarantine]
+            if quarantined:
+                print("Skipping %d quarantined games (see %s)" % (len(quarantined), self.quarantine_file))
+                ulx_files = [game for game in ulx_files if game not in quarantine]
 
-        agent = WalkthroughAgent()
-        pbar = tqdm(ulx_files, total=len(ulx_files))
-        for game in pbar:
-            self.walk_game(game, agent)
+        writer = None
+        if self.shard_dir is not None:
+            writer = ShardWriter(self.shard_dir, checkpoint_every=self.checkpoint_every)
+            for _, pairs, feedback_counts in writer.records():
+                self.merge_pairs(pairs, feedback_counts)
+
+            processed = set(writer.processed_games)
+            if processed:
+                print("Resuming after %d already parsed games" % len(processed))
+                ulx_files = [game for game in ulx_files if game not in processed]
+
+        if self.workers > 1 or self.timeout is not None:
+            self.parse_games_parallel(ulx_files, writer, quarantine=quarantine)
+        elif self.batch_size > 1 and not self.fast and self.explore is None:
+            self.parse_games_batched(ulx_files, writer)
+        else:
+            agent = _make_agent(self.explore)
+            pbar = tqdm(ulx_files, total=len(ulx_files))
+            for game in pbar:
+                if writer is None:
+                    self.walk_game(game, agent)
+                else:
+                    partial = TextWorldACG.partial(self.profiler, self.fast, self.check_rate)
+                    partial.walk_game(game, agent)
+                    self.merge_pairs(partial.state_action_pairs, partial.feedback_counts)
+                    self.cross_checks.update(partial.cross_checks)
+                    writer.write([game], partial.state_action_pairs, partial.feedback_counts)
+
+        if writer is not None:
+            writer.close()
+
+        if self.failures:
+            print("Skipped %d games that failed or timed out, quarantined in %s"
+                  % (len(self.failures), self.quarantine_file))
+            for game, error in sorted(self.failures.items()):
+                print("  %s: %s" % (game, error))
+
+        if self.cross_checks:
+            self.report_cross_checks()
+
+        if self.profiler is not None:
+            print(self.profiler.summary(nb_states=len(self.state_action_pairs)))
+            if self.profile_file is not None:
+                self.profiler.export(self.profile_file)
+
+        # The accumulators are only needed while merging: the shards were written with the workers' own.
+        self.index.freeze()
+
+    def report_cross_checks(self):
+        """
+        Prints how the games walked in fast mode differ from the interpreter: the games whose admissible
+        commands differ, and the rate of steps whose state, inventory or feedback text differs.
+        """
+        from utils.simulate import TEXT_FIELDS
+
+        nb_steps = sum(steps for steps, _ in self.cross_checks.values())
+        text_mismatches = dict.fromkeys(TEXT_FIELDS, 0)
+        command_mismatches = {}
+        for game, (_, mismatches) in self.cross_checks.items():
+            for step, command, missing, extra, texts in mismatches:
+                for field in texts:
+                    text_mismatches[field] += 1
+                if (missing or extra) and game not in command_mismatches:
+                    command_mismatches[game] = step, command, missing, extra
+
+        print("Cross-checked %d games (%d steps) against the interpreter, %d with different admissible commands"
+              % (len(self.cross_checks), nb_steps, len(command_mismatches)))
+        print("  steps whose text differs: " + ", ".join("%s %.1f%%" % (field, 100 * count / max(1, nb_steps))
+                                                        for field, count in text_mismatches.items()))
+        for game, (step, command, missing, extra) in sorted(command_mismatches.items()):
+            print("  %s: step %d (%s), missing %s, extra %s" % (game, step, command, missing, extra))
+
+    def parse_games_batched(self, ulx_files, writer=None):
+        """
+        Walks the games in lockstep batches of self.batch_size in this process.
+        """
+        from tqdm import tqdm
+        pbar = tqdm(total=len(ulx_files))
+        with ThreadPoolExecutor(self.batch_size) as executor:
+            for i in range(0, len(ulx_files), self.batch_size):
+                batch = ulx_files[i:i + self.batch_size]
+                partial = TextWorldACG.partial(self.profiler)
+                partial.walk_games_batched(batch, executor)
+                self.merge_pairs(partial.state_action_pairs, partial.feedback_counts)
+                if writer is not None:
+                    writer.write(batch, partial.state_action_pairs, partial.feedback_counts)
+                pbar.update(len(batch))
+        pbar.close()
+
+    def parse_games_parallel(self, ulx_files, writer=None, chunk_size=16, quarantine=None):
+        """
+        Splits the games into contiguous chunks walked by a pool of self.workers processes
+        (or by this process when there is only one worker, e.g. to supervise a serial parse).
+        Chunks are merged back in order, so the result is the same as a serial parse.
+        :param quarantine: utils.supervise.Quarantine the games failing under supervision are added to
+        """
+        from tqdm import tqdm
+        chunks = [ulx_files[i:i + chunk_size] for i in range(0, len(ulx_files), chunk_size)]
+
+        walk_games = functools.partial(_walk_games, profile=self.profiler is not None,
+                                       fast=self.fast, check_rate=self.check_rate, batch_size=self.batch_size,
+                                       timeout=self.timeout, retries=self.retries, explore=self.explore)
+
+        pbar = tqdm(total=len(ulx_files))
+        with ExitStack() as stack:
+            if self.workers > 1:
+                pool = stack.enter_context(multiprocessing.Pool(self.workers, maxtasksperchild=self.recycle_every))
+                results = pool.imap(walk_games, chunks)
+            else:
+                results = map(walk_games, chunks)
+            for chunk, (pairs, feedback_counts, profile, cross_checks, failures) in zip(chunks, results):
+                self.merge_pairs(pairs, feedback_counts)
+                self.cross_checks.update(cross_checks)
+                if profile is not None:
+                    self.profiler.merge(profile)
+                for game, error in failures.items():
+                    self.failures[game] = error
+                    if quarantine is not None:
+                        quarantine.add(game, error)
+                if writer is not None:
+                    writer.write(chunk, pairs, feedback_counts)
+                pbar.update(len(chunk))
+        pbar.close()
+
+    @property
+    def feedback_counts(self):
+        """
+        How many times each distinct feedback was seen, per state/action pair.
+        """
+        return self.index.feedback_counts()
+
+    def merge_pairs(self, pairs, feedback_counts=None):
+        """
+        Merges state/action pairs parsed by another dataset (e.g. a parse worker) into this one.
+        :param feedback_counts: the other dataset's feedback_counts, so that feedback is
+                                deduplicated the same way as if the pairs had been parsed here
+        """
+        if feedback_counts is None:
+            feedback_counts = [None] * len(pairs)
+        for pair, counts in zip(pairs, feedback_counts):
+            self.add_pair(*pair, feedback_counts=counts)
+
+    def add_pair(self, state, feedback, inventory, actions, state_entities, previous_actions,
+                 feedback_counts=None):
+        """
+        Adds a state/action pair, merging it into the existing pair if we've already seen this state.
+        Pairs are keyed on a digest of the state and inventory and looked up in the dedup index (see utils.dedup).
+        Actions, entities and previous actions are accumulated in sets and feedback is counted,
+        so merging only ever adds new content.
+        """
+        key = get_state_key(state, inventory)
+        record = self.index.get(key)
+        if record is None:
+            record = self.index.add(key, [state, '', inventory, [], [], []])
+
+        # we're here if the state descriptions are the same (or we just added it).
+        pair, (counts, seen_actions, seen_entities, seen_previous_actions) = record
+        for text, count in (feedback_counts or {feedback: 1}).items():
+            if text not in counts:
+                counts[text] = 0
+                pair[1] = text + pair[1]
+            counts[text] += count
+
+        _extend_unique(pair[3], seen_actions, actions)
+        _extend_unique(pair[4], seen_entities, state_entities)
+        _extend_unique(pair[5], seen_previous_actions, previous_actions)
 
     @classmethod
     def run_one_game(cls, game_file):
+        import textworld
         env = textworld.start(game_file)
         env.activate_state_tracking()
         game_state = env.reset()
@@ -65,19 +369,76 @@ class TextWorldACG:
 
     def walk_game(self, game, agent):
         """
-        walks through an entire game and returns its state/action pairs.
+        walks through an entire game and adds its state/action pairs to the dataset.
+        The environment comes from this process' EnvironmentPool and is closed once the game is done.
+        In fast mode, the game is played on its logic state and only sampled games are run in the interpreter.
         :param game:
-        :param agent:
-        :return: array of state, action pairs (untokenized)
+        :param agent: a WalkthroughAgent, or an ExplorationAgent to explore the game (see explore_env)
+        :return: number of steps taken
         """
+        from utils.envs import get_environment_pool
+        from utils.simulate import LogicEnvironment
 
-        env = textworld.start(game)
-        logic = env.game.kb.logic
-        env.enable_extra_info("description")
-        env.enable_extra_info("inventory")
-        env.activate_state_tracking()
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start_game(game)
+
+        walk_env = self.explore_env if hasattr(agent, 'explore') else self.walk_env
+        if self.fast:
+            env = LogicEnvironment(get_environment_pool().load_game(game))
+            steps = walk_env(env, agent)
+            if profiler is not None:
+                profiler.lap('close')
+            if self.check_rate and random.Random(game).random() < self.check_rate:
+                self.check_game(game, env)
+                if profiler is not None:
+                    profiler.lap('check')
+        else:
+            with get_environment_pool().start(game) as env:
+                steps = walk_env(env, agent)
+            if profiler is not None:
+                profiler.lap('close')
+
+        if profiler is not None:
+            profiler.end_game(steps)
+        return steps
+
+    def check_game(self, game, sim_env):
+        """
+        Plays game's walkthrough in the interpreter and in sim_env and records in self.cross_checks
+        the steps where their admissible commands or texts differ (see utils.simulate.cross_check).
+        """
+        from agents.walkthrough import WalkthroughAgent, WalkthroughDone
+        from utils.envs import get_environment_pool
+        from utils.simulate import cross_check
+
+        agent = WalkthroughAgent()
+        agent.reset(sim_env)
+        commands = []
+        while True:
+            try:
+                commands.append(agent.act(None, 0, False))
+            except WalkthroughDone:
+                break
+
+        with get_environment_pool().start(game) as env:
+            self.cross_checks[game] = cross_check(env, sim_env, commands)
+
+    def walk_env(self, env, agent):
+        """
+        walks through the game loaded in env (not reset yet) and adds its state/action pairs to the dataset.
+        :return: number of steps taken
+        """
+        from agents.walkthrough import WalkthroughDone
+
+        profiler = self.profiler
+        self._setup_env(env)
+        if profiler is not None:
+            profiler.lap('start')
         game_state = env.reset()
-        entities = [(ent.name.lower(), logic.inform7.types[ent.type].kind) for ent in env.game.infos.values() if ent.name]
+        if profiler is not None:
+            profiler.lap('reset')
+        matcher = self._entity_matcher(env)
         agent.reset(env)
         done = False
         reward = 0
@@ -86,37 +447,296 @@ class TextWorldACG:
         while not done:
             try:
                 command = agent.act(game_state, reward, done)
-                feedback = ''
-                if not is_first:
-                    feedback = game_state.feedback.replace('\n', ' ')
-                else:
-                    is_first = False
-
-                state, inventory, actions = parse_game_state(game_state)
-                state, feedback, inventory = state.lower(), feedback.lower(), inventory.lower()
+                state, feedback, inventory, actions = self._parse_step(game_state, is_first)
+                is_first = False
                 comb_state = state + inventory
+                if profiler is not None:
+                    profiler.lap('parse')
 
-                state_entities = get_state_entities(entities, comb_state)
-                if state + inventory in self.state_mappings:
-                    index = self.state_mappings[state + inventory]
-                    state_copy, feedback_copy, inventory_copy, actions_copy, state_entities_copy, previous_actions_copy = self.state_action_pairs[index]
-
-                    # we're here if the state descriptions are the same.
-                    feedback_copy = feedback + feedback_copy
-                    actions_copy = list(set(actions_copy + actions))
-                    state_entities_copy = list(set(state_entities + state_entities_copy))
-                    previous_actions_copy = list(set(previous_actions + previous_actions_copy))
-                    self.state_action_pairs[index] = [state_copy, feedback_copy, inventory_copy, actions_copy, state_entities_copy, previous_actions_copy]
-                else:
-                    self.state_mappings[state + inventory] = self.counter
-                    self.state_action_pairs.append([state, feedback, inventory, actions, state_entities, previous_actions[:]])
-                    self.counter += 1
+                state_entities = matcher.match(comb_state)
+                if profiler is not None:
+                    profiler.lap('entities')
+                self.add_pair(state, feedback, inventory, actions, state_entities, previous_actions)
+                if profiler is not None:
+                    profiler.lap('merge')
 
                 game_state, reward, done = env.step(command)
                 previous_actions.append(command)
+                if profiler is not None:
+                    profiler.lap('step')
             except WalkthroughDone:
                 break
 
+        return len(previous_actions)
+
+    def explore_env(self, env, agent):
+        """
+        Same as walk_env, but adds every state agent (an agents.explore.ExplorationAgent) reaches
+        while branching over the admissible commands.
+        :return: number of steps taken, including the ones replaying commands
+        """
+        profiler = self.profiler
+        self._setup_env(env)
+        if profiler is not None:
+            profiler.lap('start')
+        matcher = None
+        for game_state, previous_actions in agent.explore(env):
+            if profiler is not None:
+                profiler.lap('step' if previous_actions else 'reset')
+            if matcher is None:
+                matcher = self._entity_matcher(env)
+            state, feedback, inventory, actions = self._parse_step(game_state, not previous_actions)
+            if profiler is not None:
+                profiler.lap('parse')
+
+            state_entities = matcher.match(state + inventory)
+            if profiler is not None:
+                profiler.lap('entities')
+            self.add_pair(state, feedback, inventory, actions, state_entities, previous_actions)
+            if profiler is not None:
+                profiler.lap('merge')
+
+        return agent.steps
+
+    def walk_games_batched(self, games, executor):
+        """
+        walks through games in lockstep and adds their state/action pairs to the dataset.
+        Every round sends each game its next walkthrough command, with the interpreters stepped
+        concurrently by executor's threads (which wait on interpreter I/O without holding the GIL),
+        then parses the whole round. Pairs are merged game by game once all games are done,
+        so the dataset is the same as after calling walk_game on each game in order.
+        :param executor: concurrent.futures.Executor with at least len(games) threads
+        :return: total number of steps taken
+        """
+        from agents.walkthrough import WalkthroughAgent, WalkthroughDone
+        from utils.envs import get_environment_pool
+
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start_game(' '.join(games))
+
+        pool = get_environment_pool()
+        pool.size = max(pool.size, len(games))
+        with ExitStack() as stack:
+            envs = [stack.enter_context(pool.start(game)) for game in games]
+            for env in envs:
+                self._setup_env(env)
+            if profiler is not None:
+                profiler.lap('start')
+            game_states = list(executor.map(lambda env: env.reset(), envs))
+            if profiler is not None:
+                profiler.lap('reset')
+
+            matchers = [self._entity_matcher(env) for env in envs]
+            agents = [WalkthroughAgent() for _ in envs]
+            for agent, env in zip(agents, envs):
+                agent.reset(env)
+            rewards = [0] * len(envs)
+            records = [[] for _ in envs]
+            previous_actions = [[] for _ in envs]
+            active = list(range(len(envs)))
+            while active:
+                commands = {}
+                for i in active:
+                    try:
+                        commands[i] = agents[i].act(game_states[i], rewards[i], False)
+                    except WalkthroughDone:
+                        continue
+                    state, feedback, inventory, actions = self._parse_step(game_states[i], not previous_actions[i])
+                    state_entities = matchers[i].match(state + inventory)
+                    records[i].append((state, feedback, inventory, actions, state_entities, list(previous_actions[i])))
+                if profiler is not None:
+                    profiler.lap('parse')
+
+                results = executor.map(lambda i: envs[i].step(commands[i]), commands)
+                active = []
+                for i, (game_state, reward, done) in zip(commands, results):
+                    game_states[i], rewards[i] = game_state, reward
+                    previous_actions[i].append(commands[i])
+                    if not done:
+                        active.append(i)
+                if profiler is not None:
+                    profiler.lap('step')
+
+        if profiler is not None:
+            profiler.lap('close')
+        for game_records in records:
+            for record in game_records:
+                self.add_pair(*record)
+
+        steps = sum(len(actions) for actions in previous_actions)
+        if profiler is not None:
+            profiler.lap('merge')
+            profiler.end_batch(len(games), steps)
+        return steps
+
+    def _setup_env(self, env):
+        env.enable_extra_info("description")
+        env.enable_extra_info("inventory")
+        env.activate_state_tracking()
+
+    def _entity_matcher(self, env):
+        logic = env.game.kb.logic
+        entities = [(ent.name.lower(), logic.inform7.types[ent.type].kind) for ent in env.game.infos.values() if ent.name]
+        return get_entity_matcher(tuple(entities))
+
+    def _parse_step(self, game_state, is_first):
+        """
+        :return: the lowercased state, feedback (empty for the first state), inventory and the admissible actions
+        """
+        feedback = ''
+        if not is_first:
+            feedback = game_state.feedback.replace('\n', ' ')
+        state, inventory, actions = parse_game_state(game_state)
+        return state.lower(), feedback.lower(), inventory.lower(), actions
+
+
+def _extend_unique(values, seen, new_values):
+    for value in new_values:
+        if value not in seen:
+            seen.add(value)
+            values.append(value)
+
+
+def _make_agent(explore=None):
+    """
+    :param explore: ExplorationAgent keyword arguments, None to follow the walkthrough
+    """
+    if explore is not None:
+        from agents.explore import ExplorationAgent
+        return ExplorationAgent(**explore)
+
+    from agents.walkthrough import WalkthroughAgent
+    return WalkthroughAgent()
+
+
+def _walk_games(games, profile=False, fast=False, check_rate=0.0, batch_size=1, timeout=None, retries=0,
+                explore=None):
+    """
+    Parse worker: walks a chunk of games into a fresh partial dataset.
+    With a timeout, every game is walked on its own in a supervised child process instead (see _walk_supervised).
+    :return: the chunk's state_action_pairs, feedback_counts, profile (None if not profiling),
+             cross_checks and the errors of the games that failed under supervision
+    """
+    dataset = TextWorldACG.partial(WalkProfiler() if profile else None, fast, check_rate)
+    failures = {}
+    if timeout is not None:
+        failures = _walk_supervised(dataset, games, Supervisor(timeout, retries), profile, explore)
+    elif batch_size > 1 and not fast and explore is None:
+        with ThreadPoolExecutor(batch_size) as executor:
+            for i in range(0, len(games), batch_size):
+                dataset.walk_games_batched(games[i:i + batch_size], executor)
+    else:
+        agent = _make_agent(explore)
+        for game in games:
+            dataset.walk_game(game, agent)
+
+    profile = dataset.profiler.to_dict() if dataset.profiler is not None else None
+    return dataset.state_action_pairs, dataset.feedback_counts, profile, dataset.cross_checks, failures
+
+
+def _walk_supervised(dataset, games, supervisor, profile=False, explore=None):
+    """
+    Walks each game in a child process run by supervisor and merges the ones that succeeded into dataset,
+    so that a hung interpreter or a game raising mid-walk only costs that game.
+    :return: the error of each game that failed every attempt
+    """
+    failures = {}
+    walk_games = functools.partial(_walk_games, profile=profile, fast=dataset.fast, check_rate=dataset.check_rate,
+                                   explore=explore)
+    for game in games:
+        result, error = supervisor.run(walk_games, [game])
+        if error is not None:
+            failures[game] = error
+            continue
+
+        pairs, feedback_counts, game_profile, cross_checks, _ = result
+        dataset.merge_pairs(pairs, feedback_counts)
+        dataset.cross_checks.update(cross_checks)
+        if game_profile is not None:
+            dataset.profiler.merge(game_profile)
+    return failures
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games_dir", default='../tw_games/',
+                        help="Directory of the generated games. Default: %(default)s")
+    parser.add_argument("--file_name", default='../data/train.text.dataset.json',
+                        help="Where to save the parsed dataset. Default: %(default)s")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Nb. of processes walking games in parallel. Default: %(default)s")
+    parser.add_argument("--shard_dir",
+                        help="Stream parsed games to JSONL shards in this directory, resuming from its checkpoint.")
+    parser.add_argument("--checkpoint_every", type=int, default=100,
+                        help="Nb. of shard writes between two checkpoints. Default: %(default)s")
+    parser.add_argument("--intern", action="store_true",
+                        help="Store actions, entities and previous actions as ids into shared vocab tables.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time every phase of the walk and print a summary at the end.")
+    parser.add_argument("--profile_file",
+                        help="Export per-game timings to this .json or .csv file (implies --profile).")
+    parser.add_argument("--recycle_every", type=int,
+                        help="Replace each parse worker process after it walked this many chunks of games.")
+    parser.add_argument("--fast", action="store_true",
+                        help="Walk games on their logic state instead of running them in the interpreter. "
+                             "Records differ from an interpreter parse: descriptions don't list objects and "
+                             "most actions get an empty feedback, so states are keyed and deduplicated differently.")
+    parser.add_argument("--check_rate", type=float, default=0.01,
+                        help="With --fast, fraction of games checked against the interpreter, reporting the "
+                             "games with different admissible commands and the rate of steps with different texts. "
+                             "Default: %(default)s")
+    parser.add_argument("--batch_size", type=int, default=1,
+                        help="Nb. of games each process walks in lockstep. Default: %(default)s")
+    parser.add_argument("--shard_index", type=int, default=0,
+                        help="Only parse shard I out of --num_shards of the games. Default: %(default)s")
+    parser.add_argument("--num_shards", type=int, default=1,
+                        help="Nb. of shards (e.g. nodes) the games are split into. Default: %(default)s")
+    parser.add_argument("--where", action="append", type=parse_condition, default=[], metavar="CONDITION",
+                        help="Only parse the games of the catalog matching e.g. 'quest_length>=5'. Can be repeated.")
+    parser.add_argument("--sample", type=int,
+                        help="Only parse this many games, drawn at random from the (selected) games.")
+    parser.add_argument("--timeout", type=float,
+                        help="Walk every game in a child process killed after this many seconds, "
+                             "skipping and quarantining the games that keep failing.")
+    parser.add_argument("--retries", type=int, default=1,
+                        help="With --timeout, nb. of times a failed game is retried. Default: %(default)s")
+    parser.add_argument("--quarantine_file",
+                        help="With --timeout, where failed games are listed (and skipped on later runs). "
+                             "Default: next to --file_name")
+    parser.add_argument("--explore", action="store_true",
+                        help="Explore games over their admissible commands instead of following their walkthrough "
+                             "(fastest with --fast, whose environments restore snapshots instead of replaying commands).")
+    parser.add_argument("--index_file",
+                        help="Deduplicate states through a SQLite index in this file instead of in memory, "
+                             "so that memory stays bounded (save the dataset as .bin or .zbin to keep it so).")
+    parser.add_argument("--index_cache", type=int, default=100000,
+                        help="With --index_file, nb. of states kept in memory. Default: %(default)s")
+    parser.add_argument("--explore_depth", type=int, default=10,
+                        help="With --explore, longest sequence of commands explored. Default: %(default)s")
+    parser.add_argument("--explore_breadth", type=int, default=8,
+                        help="With --explore, nb. of commands tried from each state. Default: %(default)s")
+    parser.add_argument("--explore_states", type=int, default=200,
+                        help="With --explore, nb. of distinct states explored per game. Default: %(default)s")
+    args = parser.parse_args()
+    if args.index_cache < 1:
+        parser.error("--index_cache must be at least 1")
+    if args.num_shards > 1 and args.shard_dir is None:
+        parser.error("--num_shards needs a --shard_dir per shard, which merge_shards.py merges")
+    return args
+
 if __name__ == "__main__":
-    dataset = TextWorldACG()
+    args = parse_args()
+    explore = None
+    if args.explore:
+        explore = {'max_depth': args.explore_depth, 'max_breadth': args.explore_breadth,
+                   'max_states': args.explore_states}
+    dataset = TextWorldACG(games_dir=args.games_dir, file_name=args.file_name, workers=args.workers,
+                           shard_dir=args.shard_dir, checkpoint_every=args.checkpoint_every,
+                           intern=args.intern, profile=args.profile, profile_file=args.profile_file,
+                           recycle_every=args.recycle_every, fast=args.fast, check_rate=args.check_rate,
+                           batch_size=args.batch_size, shard_index=args.shard_index, num_shards=args.num_shards,
+                           where=args.where, sample=args.sample, timeout=args.timeout, retries=args.retries,
+                           quarantine_file=args.quarantine_file, explore=explore,
+                           index_file=args.index_file, index_cache=args.index_cache)
 
@@ -0,0 +1,90 @@
+import random
+from collections import deque
+
+from utils.parse import get_state_key, parse_game_state
+
+
+class ExplorationAgent:
+    """
+    Agent that explores a game breadth-first over the admissible commands of the states it reaches,
+    rather than only following the walkthrough, so that a game contributes a tree of states instead of a line.
+
+    States are identified like in the dataset (utils.parse.get_state_key), so a state reached again
+    is only expanded the first time. Environments able to snapshot their state (get_state/set_state,
+    e.g. utils.simulate.LogicEnvironment) are restored to a state before branching from it. The glulx
+    interpreter can't, so the commands leading to the state are replayed from a reset instead.
+    """
+
+    def __init__(self, max_depth=10, max_breadth=8, max_states=200, seed=1234):
+        """
+        :param max_depth: longest sequence of commands explored from the initial state
+        :param max_breadth: nb. of admissible commands tried from each state, drawn at random
+        :param max_states: nb. of distinct states after which exploration stops
+        """
+        self.max_depth = max_depth
+        self.max_breadth = max_breadth
+        self.max_states = max_states
+        self.seed = seed
+        self.steps = 0
+
+    def explore(self, env):
+        """
+        Resets env and explores it, yielding every state reached (revisits included, as each one
+        comes with its own feedback) along with the commands that led to it.
+        self.steps counts the commands sent to env, replays included.
+        """
+        rng = random.Random(self.seed)
+        snapshots = hasattr(env, "get_state") and hasattr(env, "set_state")
+        self.steps = 0
+
+        game_state = env.reset()
+        seen = {self._key(game_state)}
+        yield game_state, []
+
+        frontier = deque([(env.get_state() if snapshots else None, [], game_state)])
+        position = []  # Commands leading to env's current state.
+        while frontier:
+            snapshot, path, game_state = frontier.popleft()
+            if len(path) >= self.max_depth:
+                continue
+
+            for command in self._branches(game_state, rng):
+                if len(seen) >= self.max_states:
+                    return
+
+                if position != path:
+                    self._restore(env, snapshot, path)
+                next_state, _, done = env.step(command)
+                self.steps += 1
+                position = path + [command]
+                yield next_state, position
+
+                key = self._key(next_state)
+                if key in seen:
+                    continue
+                seen.add(key)
+                if not done:
+                    frontier.append((env.get_state() if snapshots else None, position, next_state))
+
+    def _restore(self, env, snapshot, path):
+        if snapshot is not None:
+            env.set_state(snapshot)
+            return
+
+        env.reset()
+        for command in path:
+            env.step(command)
+        self.steps += len(path)
+
+    def _branches(self, game_state, rng):
+        # Looking, taking inventory and examining never lead to a new state, don't spend the breadth on them.
+        commands = [command for command in game_state.admissible_commands
+                    if command not in ("look", "inventory") and not command.startswith("examine ")]
+        if len(commands) > self.max_breadth:
+            commands = rng.sample(commands, self.max_breadth)
+        return commands
+
+    @staticmethod
+    def _key(game_state):
+        state, inventory, _ = parse_game_state(game_state)
+        return get_state_key(state.lower(), inventory.lower())
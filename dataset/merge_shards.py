@@ -0,0 +1,69 @@
+"""
+Merges the shard directories of several parse shards (acg.py --num_shards N --shard_index I --shard_dir DIR)
+into one dataset:
+
+    python merge_shards.py ../data/shards/parse-* --file_name ../data/train.text.dataset.json
+
+Batches of games are replayed through TextWorldACG.merge_pairs in the order of the sorted game list,
+whatever the order of the directories, so the result is the same as parsing all games in one run
+and doesn't depend on the number of shards.
+"""
+import os
+import heapq
+import argparse
+
+from acg import TextWorldACG
+from utils.dedup import DiskIndex
+from utils.writer import ShardWriter
+
+
+def batch_key(record):
+    games, _, _ = record
+    return os.path.basename(games[0]) if games else ''
+
+
+def merge_shard_dirs(shard_dirs, index_file=None, index_cache=100000):
+    """
+    :param index_file: merge through a utils.dedup.DiskIndex in this file rather than in memory
+    :return: the merged dataset (a partial TextWorldACG)
+    """
+    dataset = TextWorldACG.partial()
+    if index_file is not None:
+        dataset.index = DiskIndex(index_file, cache_size=index_cache)
+        dataset.state_action_pairs = dataset.index.pairs
+    # Every shard directory holds a contiguous run of the sorted games, in order.
+    records = heapq.merge(*(ShardWriter(shard_dir).records() for shard_dir in shard_dirs), key=batch_key)
+
+    seen_games = set()
+    for games, pairs, feedback_counts in records:
+        names = set(os.path.basename(game) for game in games)
+        if names & seen_games:
+            print("Skipping a batch of games already merged from another shard: %s" % sorted(names & seen_games))
+            continue
+        seen_games.update(names)
+        dataset.merge_pairs(pairs, feedback_counts)
+
+    print("Merged %d games into %d state/action pairs" % (len(seen_games), len(dataset)))
+    return dataset
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Merge the shard directories of a sharded parse into one dataset.")
+    parser.add_argument("shard_dirs", nargs="+",
+                        help="--shard_dir of every parse shard, in any order.")
+    parser.add_argument("--file_name", default='../data/train.text.dataset.json',
+                        help="Where to save the merged dataset (.bin for the binary format). Default: %(default)s")
+    parser.add_argument("--index_file",
+                        help="Deduplicate states through a SQLite index in this file instead of in memory.")
+    parser.add_argument("--index_cache", type=int, default=100000,
+                        help="With --index_file, nb. of states kept in memory. Default: %(default)s")
+    args = parser.parse_args()
+    if args.index_cache < 1:
+        parser.error("--index_cache must be at least 1")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    dataset = merge_shard_dirs(args.shard_dirs, args.index_file, args.index_cache)
+    dataset.save(args.file_name)
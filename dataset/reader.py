@@ -0,0 +1,55 @@
+"""
+Opens datasets saved by acg.py with only the standard library (and NumPy to tokenize them), without
+importing TextWorld or anything else needed to parse games:
+
+    from reader import DatasetReader
+    dataset = DatasetReader('../data/train.text.dataset.bin')
+    state, feedback, inventory, actions, entities, previous_actions = dataset[0]
+"""
+import json
+
+from utils.binary import BinaryDataset, is_binary_dataset
+from utils.vocab import InternedPairs
+
+
+def load_pairs(file_name, intern=False):
+    """
+    Loads the state/action pairs of a saved dataset. Binary datasets are memory-mapped and decoded lazily.
+    :param intern: keep the pairs of a JSON dataset as ids into shared vocab tables (see utils.vocab.InternedPairs)
+    """
+    if is_binary_dataset(file_name):
+        return BinaryDataset(file_name)
+
+    with open(file_name) as f:
+        pairs = json.load(f)
+    if intern:
+        pairs = InternedPairs(pairs)
+    return pairs
+
+
+class DatasetReader:
+    """
+    Read-only, indexable view of a saved dataset, with the same item access as TextWorldACG.
+    """
+
+    def __init__(self, file_name, intern=False):
+        self.file_name = file_name
+        self.state_action_pairs = load_pairs(file_name, intern=intern)
+
+    def __getitem__(self, idx):
+        return self.state_action_pairs[idx]
+
+    def __len__(self):
+        return len(self.state_action_pairs)
+
+    def __iter__(self):
+        return iter(self.state_action_pairs)
+
+    def tokenize(self, cache_dir='../data/tokens/', tokenizer=None, max_len=None):
+        """
+        Same as TextWorldACG.tokenize.
+        """
+        from utils.tokenize import file_fingerprint, tokenize_dataset
+
+        return tokenize_dataset(self.state_action_pairs, cache_dir, tokenizer=tokenizer,
+                                dataset_hash=file_fingerprint(self.file_name), max_len=max_len)
@@ -0,0 +1,262 @@
+"""
+Computes statistics of a dataset in one streaming pass, without loading it:
+
+    python stats.py ../data/train.text.dataset.bin --report ../data/stats.json
+
+Sources can be anything utils.stream.read_pairs reads (.json, .bin/.zbin, .jsonl shards, --shard_dir directories).
+Reports the vocabulary size (at the min_count thresholds of utils.tokenize.Tokenizer.build), token length
+histograms of the states, feedback and inventories, the nb. of admissible actions and of previous actions
+per state, the entity type distribution and the dedup ratio (records vs distinct states). Lengths are counted in NumPy
+histograms, tokens are counted a batch at a time and the distinct states are kept as 8-byte digests,
+so memory doesn't grow with the length of the texts.
+"""
+import json
+import time
+import argparse
+import functools
+import multiprocessing
+from array import array
+from collections import Counter
+
+import numpy as np
+
+from utils.parse import get_state_key
+from utils.stream import read_pairs
+from utils.tokenize import tokenize
+
+# Texts are measured in tokens, actions and previous_actions in commands.
+LENGTH_FIELDS = ['state', 'feedback', 'inventory', 'actions', 'previous_actions']
+MIN_COUNTS = (1, 2, 5)
+# Longest text whose tokens are cached across batches. Merged feedback is nearly unique per state,
+# caching it would keep most of the corpus's feedback in memory.
+MAX_CACHED_TEXT = 200
+
+
+class Histogram:
+    """
+    Counts of non-negative integers (e.g. lengths), added a batch at a time.
+    """
+
+    def __init__(self):
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def add(self, values):
+        """
+        :param values: array('I') of values
+        """
+        counts = np.bincount(np.frombuffer(values, dtype=np.uint32))
+        if len(counts) > len(self.counts):
+            self.counts = np.pad(self.counts, (0, len(counts) - len(self.counts)))
+        self.counts[:len(counts)] += counts
+
+    def merge(self, other):
+        if len(other.counts) > len(self.counts):
+            self.counts = np.pad(self.counts, (0, len(other.counts) - len(self.counts)))
+        self.counts[:len(other.counts)] += other.counts
+
+    def summary(self):
+        """
+        :return: count, mean, percentiles and a histogram over power-of-two buckets (0, 1, 2-3, 4-7...)
+        """
+        total = int(self.counts.sum())
+        if not total:
+            return {'count': 0}
+
+        values = np.arange(len(self.counts))
+        cumulative = np.cumsum(self.counts)
+        percentiles = {'p%d' % q: int(np.searchsorted(cumulative, total * q / 100)) for q in (50, 90, 99)}
+        edges = [0] + [1 << i for i in range(int(len(self.counts) - 1).bit_length())]
+        buckets = np.add.reduceat(self.counts, edges)
+        names = ['0'] + ['%d-%d' % (lo, 2 * lo - 1) if lo > 1 else '1' for lo in edges[1:]]
+        return dict(count=total, mean=round(float((values * self.counts).sum()) / total, 2),
+                    min=int(np.flatnonzero(self.counts)[0]), max=len(self.counts) - 1, **percentiles,
+                    buckets={name: int(count) for name, count in zip(names, buckets) if count})
+
+
+class CorpusStats:
+    """
+    Accumulates the statistics of a stream of state/action pairs, a batch of pairs at a time.
+    """
+
+    def __init__(self):
+        self.nb_pairs = 0
+        self.tokens = Counter()
+        self.actions = Counter()
+        self.entity_types = Counter()
+        self.entity_names = set()
+        self.lengths = {field: Histogram() for field in LENGTH_FIELDS}
+        self.state_keys = []
+        self.description_keys = []
+        # Short feedback, inventories and actions repeat a lot: they are only tokenized once.
+        self._tokenized = {}
+
+    def _tokens(self, text):
+        tokens = self._tokenized.get(text)
+        if tokens is None:
+            tokens = tuple(tokenize(text))
+            if len(text) <= MAX_CACHED_TEXT and len(self._tokenized) < 100000:
+                self._tokenized[text] = tokens
+        return tokens
+
+    def add_batch(self, pairs):
+        lengths = {field: array('I') for field in LENGTH_FIELDS}
+        state_keys = bytearray()
+        description_keys = bytearray()
+        # Counters are updated once per batch, updating them for every pair costs more than counting.
+        tokens, actions, entities = [], [], []
+        # Texts repeated within the batch are tokenized once, whatever their length.
+        batch_tokens = {}
+        for state, feedback, inventory, pair_actions, pair_entities, previous_actions in pairs:
+            state_tokens = tokenize(state)
+            tokens.extend(state_tokens)
+            lengths['state'].append(len(state_tokens))
+            for field, text in (('feedback', feedback), ('inventory', inventory)):
+                text_tokens = batch_tokens.get(text)
+                if text_tokens is None:
+                    text_tokens = batch_tokens[text] = self._tokens(text)
+                tokens.extend(text_tokens)
+                lengths[field].append(len(text_tokens))
+
+            lengths['actions'].append(len(pair_actions))
+            lengths['previous_actions'].append(len(previous_actions))
+            actions.extend(pair_actions)
+            entities.extend(pair_entities)
+
+            state_keys += get_state_key(state, inventory)[:8]
+            description_keys += get_state_key(state, '')[:8]
+
+        self.tokens.update(tokens)
+        self.actions.update(actions)
+        self.entity_types.update(kind for _, kind in entities)
+        self.entity_names.update(name for name, _ in entities)
+        for field, values in lengths.items():
+            self.lengths[field].add(values)
+        self.state_keys.append(np.frombuffer(bytes(state_keys), dtype=np.uint64))
+        self.description_keys.append(np.frombuffer(bytes(description_keys), dtype=np.uint64))
+        self.nb_pairs += len(lengths['state'])
+
+    def merge(self, other):
+        """
+        Adds the statistics accumulated by another CorpusStats (e.g. in a worker process).
+        """
+        self.nb_pairs += other.nb_pairs
+        for name in ('tokens', 'actions', 'entity_types'):
+            getattr(self, name).update(getattr(other, name))
+        self.entity_names.update(other.entity_names)
+        for field, histogram in self.lengths.items():
+            histogram.merge(other.lengths[field])
+        self.state_keys.extend(other.state_keys)
+        self.description_keys.extend(other.description_keys)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_tokenized'] = {}  # Only a cache, not worth sending back from workers.
+        return state
+
+    def report(self):
+        # Actions are counted as whole texts, their tokens weighted by how often they appear.
+        tokens = Counter(self.tokens)
+        for text, count in self.actions.items():
+            for token in self._tokens(text):
+                tokens[token] += count
+
+        distinct_states = _nb_distinct(self.state_keys)
+        return {
+            'pairs': self.nb_pairs,
+            'distinct_states': distinct_states,
+            'distinct_descriptions': _nb_distinct(self.description_keys),
+            'dedup_ratio': round(distinct_states / self.nb_pairs, 4) if self.nb_pairs else None,
+            'vocab_size': {'min_count_%d' % min_count: sum(count >= min_count for count in tokens.values())
+                           for min_count in MIN_COUNTS},
+            'distinct_actions': len(self.actions),
+            'top_actions': self.actions.most_common(10),
+            'distinct_entities': len(self.entity_names),
+            'entity_types': dict(self.entity_types.most_common()),
+            'lengths': {field: histogram.summary() for field, histogram in self.lengths.items()},
+        }
+
+
+def _nb_distinct(keys):
+    return int(len(np.unique(np.concatenate(keys)))) if keys else 0
+
+
+def _read_stats(worker_index, sources, every=1, num_workers=1, batch_size=10000):
+    """
+    Accumulates the statistics of the pairs of worker_index, which reads every (every * num_workers)-th pair.
+    """
+    stats = CorpusStats()
+    batch = []
+    for source in sources:
+        for pair in read_pairs(source, worker_index * every, every * num_workers):
+            batch.append(pair)
+            if len(batch) == batch_size:
+                stats.add_batch(batch)
+                batch = []
+    if batch:
+        stats.add_batch(batch)
+    return stats
+
+
+def corpus_stats(sources, every=1, workers=1):
+    """
+    :param sources: dataset files and/or shard directories
+    :param every: only read every `every`-th pair of each source (binary datasets only decode those)
+    :param workers: nb. of processes reading disjoint pairs of the sources
+    :return: the report, as a JSON-serializable dict
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+
+    read_stats = functools.partial(_read_stats, sources=sources, every=every, num_workers=workers)
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(read_stats, range(workers))
+        stats = results[0]
+        for other in results[1:]:
+            stats.merge(other)
+    else:
+        stats = read_stats(0)
+
+    report = stats.report()
+    report['sources'] = list(sources)
+    report['every'] = every
+    return report
+
+
+def format_report(report):
+    lines = ["%d pairs, %d distinct states (dedup ratio %s), %d distinct descriptions"
+             % (report['pairs'], report['distinct_states'], report['dedup_ratio'], report['distinct_descriptions']),
+             "vocab size: " + ", ".join("%s %d" % item for item in report['vocab_size'].items()),
+             "%d distinct actions, %d distinct entities" % (report['distinct_actions'], report['distinct_entities']),
+             "entity types: " + ", ".join("%s %d" % item for item in report['entity_types'].items())]
+    row = "  {:<16} {:>7} {:>5} {:>5} {:>5} {:>5} {:>6}"
+    lines.append(row.format('lengths', 'mean', 'min', 'p50', 'p90', 'p99', 'max'))
+    for field, summary in report['lengths'].items():
+        if summary['count']:
+            lines.append(row.format(field, summary['mean'], summary['min'], summary['p50'], summary['p90'],
+                                    summary['p99'], summary['max']))
+    return "\n".join(lines)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compute the statistics of a dataset in one streaming pass.")
+    parser.add_argument("sources", nargs="+",
+                        help="Dataset files (.json, .bin, .zbin, .jsonl) and/or --shard_dir directories.")
+    parser.add_argument("--report",
+                        help="Also write the report to this JSON file.")
+    parser.add_argument("--every", type=int, default=1,
+                        help="Only read every N-th pair, for quick checks. Default: %(default)s")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Nb. of processes reading disjoint pairs of the sources. Default: %(default)s")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    start = time.perf_counter()
+    report = corpus_stats(args.sources, every=args.every, workers=args.workers)
+    print(format_report(report))
+    print("Read %d pairs in %.1fs" % (report['pairs'], time.perf_counter() - start))
+    if args.report is not None:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,338 @@
+"""
+Binary dataset format with a fixed-width offset index, read through ``mmap``.
+
+Layout (all integers little-endian)::
+
+    MAGIC (8 bytes)
+    count, meta_offset, index_offset (3 x uint64)
+    record 0 .. record count-1
+    meta (UTF-8 JSON)
+    index (count + 1 x uint64, absolute offset of every record, then meta_offset)
+
+Records are only decoded when accessed, so opening a file costs a few syscalls
+whatever its size, and the pages are shared between forked data-loader workers.
+
+Compressed files (see write_compressed) use the same layout, but every record of the
+container is a zlib-compressed block of ``block_size`` dataset records. All blocks share a
+preset dictionary, stored in the meta block, built from the strings most repeated in the data
+(room descriptions, feedback sentences, admissible commands).
+"""
+import os
+import re
+import sys
+import json
+import mmap
+import zlib
+import base64
+import struct
+from array import array
+from collections import Counter, OrderedDict
+from itertools import chain, islice
+
+MAGIC = b'TWACGB01'
+HEADER = struct.Struct('<QQQ')
+OFFSET = struct.Struct('<Q')
+SPAN = struct.Struct('<QQ')
+
+INTERNED_ENCODING = 'interned'
+INTERNED_HEADER = struct.Struct('<6I')
+
+COMPRESSION = 'zlib'
+BLOCK_COUNT = struct.Struct('<I')
+ZDICT_SIZE = 32768  # zlib's window, longer dictionaries are truncated.
+# Splits encoded records into the sentences and strings that repeat across records.
+SEGMENT_SEPARATORS = re.compile(rb'(?<=[.!?])\s+|","|\n')
+
+
+def is_binary_dataset(file_name):
+    with open(file_name, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def encode_record(record):
+    return json.dumps(record, separators=(',', ':')).encode('utf-8')
+
+
+def decode_record(data):
+    return json.loads(data.decode('utf-8'))
+
+
+def _uint32_bytes(values):
+    values = array('I', values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+
+def encode_interned_record(record):
+    """
+    Encodes ((state, feedback, inventory), (action ids, entity ids, command ids)) as
+    the byte lengths of the three texts, the lengths of the three id arrays,
+    the UTF-8 texts and the ids as uint32.
+    """
+    texts, ids = record
+    texts = [text.encode('utf-8') for text in texts]
+    header = INTERNED_HEADER.pack(*[len(text) for text in texts], *[len(values) for values in ids])
+    return b''.join([header] + texts + [_uint32_bytes(values) for values in ids])
+
+
+class InternedDecoder:
+    """
+    Decodes interned records back to strings with the vocab tables stored in the file's meta block.
+    """
+
+    def __init__(self, meta):
+        self.tables = [meta['actions'], [tuple(ent) for ent in meta['entities']], meta['commands']]
+
+    def __call__(self, data):
+        data = bytes(data)
+        sizes = INTERNED_HEADER.unpack_from(data)
+        position = INTERNED_HEADER.size
+
+        record = []
+        for size in sizes[:3]:
+            record.append(data[position:position + size].decode('utf-8'))
+            position += size
+
+        for size, table in zip(sizes[3:], self.tables):
+            values = array('I', data[position:position + 4 * size])
+            if sys.byteorder != 'little':
+                values.byteswap()
+            record.append([table[i] for i in values])
+            position += 4 * size
+        return record
+
+
+def write_binary(pairs, file_name, meta=None, encode=encode_record):
+    """
+    Writes state/action pairs to file_name in the binary format.
+    :param pairs: iterable of state/action pairs
+    :param meta: JSON-serializable dict stored alongside the records, read once all records are written
+    :param encode: function turning a record into bytes
+    :return: number of records written
+    """
+    offsets = []
+    tmp_file = file_name + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(0, 0, 0))  # Filled in once we know where everything is.
+        for record in pairs:
+            offsets.append(f.tell())
+            f.write(encode(record))
+
+        meta = dict(meta or {})
+        meta.setdefault('encoding', 'json')
+        meta_offset = f.tell()
+        offsets.append(meta_offset)
+        f.write(json.dumps(meta).encode('utf-8'))
+
+        index_offset = f.tell()
+        for offset in offsets:
+            f.write(OFFSET.pack(offset))
+
+        f.seek(len(MAGIC))
+        f.write(HEADER.pack(len(offsets) - 1, meta_offset, index_offset))
+    os.replace(tmp_file, file_name)
+    return len(offsets) - 1
+
+
+def train_zdict(samples, size=ZDICT_SIZE):
+    """
+    Builds a zlib preset dictionary from encoded sample records: the segments (sentences, strings)
+    that save the most bytes, i.e. repeat the most times the longest, with the best ones last
+    since zlib finds matches closer to the end of the dictionary more cheaply.
+    """
+    counts = Counter(segment for sample in samples for segment in SEGMENT_SEPARATORS.split(sample)
+                     if len(segment) > 3)
+    scored = sorted((count * len(segment), segment) for segment, count in counts.items() if count > 1)
+
+    zdict = []
+    total = 0
+    for _, segment in reversed(scored):
+        if total + len(segment) > size:
+            continue
+        zdict.append(segment)
+        total += len(segment)
+    return b''.join(reversed(zdict))
+
+
+def _blocks(records, block_size, zdict, level, meta):
+    block = []
+    for data in records:
+        block.append(data)
+        if len(block) == block_size:
+            meta['records'] += len(block)
+            yield _compress_block(block, zdict, level)
+            block = []
+    if block:
+        meta['records'] += len(block)
+        yield _compress_block(block, zdict, level)
+
+
+def _compress_block(block, zdict, level):
+    sizes = _uint32_bytes(len(data) for data in block)
+    compressor = zlib.compressobj(level, zdict=zdict)
+    return compressor.compress(b''.join([BLOCK_COUNT.pack(len(block)), sizes] + block)) + compressor.flush()
+
+
+def write_compressed(pairs, file_name, meta=None, encode=encode_record, block_size=64, level=6, sample_size=2000):
+    """
+    Writes state/action pairs to file_name in the compressed binary format.
+    The preset dictionary is trained on the first sample_size records.
+    :param block_size: nb. of records compressed together, i.e. decompressed to access any of them
+    :return: number of records written
+    """
+    records = (encode(record) for record in pairs)
+    samples = list(islice(records, sample_size))
+    zdict = train_zdict(samples)
+
+    meta = dict(meta or {})
+    meta.setdefault('encoding', 'json')
+    meta.update({'compression': COMPRESSION, 'block_size': block_size, 'records': 0,
+                 'zdict': base64.b64encode(zdict).decode('ascii')})
+    write_binary(_blocks(chain(samples, records), block_size, zdict, level, meta), file_name, meta=meta,
+                 encode=lambda block: block)
+    return meta['records']
+
+
+def json_to_binary(json_file, bin_file, compress=False):
+    """
+    Converts a dataset saved with json.dump (e.g. train.text.dataset.json) to the binary format.
+    """
+    with open(json_file) as f:
+        pairs = json.load(f)
+    if compress:
+        return write_compressed(pairs, bin_file)
+    return write_binary(pairs, bin_file)
+
+
+class BinaryDataset:
+    """
+    Read-only, list-like view over a binary dataset file.
+    For compressed files, the last cache_blocks decompressed blocks are kept, so that reading
+    records in order decompresses every block once.
+    """
+
+    def __init__(self, file_name, cache_blocks=8):
+        self.file_name = file_name
+        self.cache_blocks = cache_blocks
+        self._open()
+
+    def _open(self):
+        with open(self.file_name, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError("{} is not a binary TextWorldACG dataset".format(self.file_name))
+
+        self._count, meta_offset, self._index_offset = HEADER.unpack_from(self._mm, len(MAGIC))
+        self.meta = json.loads(self._mm[meta_offset:self._index_offset].decode('utf-8'))
+        if self.meta['encoding'] == INTERNED_ENCODING:
+            self._decode = InternedDecoder(self.meta)
+        else:
+            self._decode = decode_record
+
+        self._blocks = None
+        if self.meta.get('compression') == COMPRESSION:
+            self._nb_blocks = self._count
+            self._count = self.meta['records']
+            self._block_size = self.meta['block_size']
+            self._zdict = base64.b64decode(self.meta['zdict'])
+            self._blocks = OrderedDict()
+
+    def __getstate__(self):
+        return {'file_name': self.file_name, 'cache_blocks': self.cache_blocks}
+
+    def __setstate__(self, state):
+        self.file_name = state['file_name']
+        self.cache_blocks = state.get('cache_blocks', 8)
+        self._open()
+
+    def __len__(self):
+        return self._count
+
+    def _span(self, idx):
+        start, end = SPAN.unpack_from(self._mm, self._index_offset + idx * OFFSET.size)
+        return self._mm[start:end]
+
+    def _block(self, block_idx):
+        """
+        Returns the records of a compressed block, as a list of bytes.
+        """
+        block = self._blocks.get(block_idx)
+        if block is not None:
+            self._blocks.move_to_end(block_idx)
+            return block
+
+        data = self._decompress(block_idx)
+        count, = BLOCK_COUNT.unpack_from(data)
+        sizes = array('I', data[BLOCK_COUNT.size:BLOCK_COUNT.size + 4 * count])
+        if sys.byteorder != 'little':
+            sizes.byteswap()
+        block = []
+        position = BLOCK_COUNT.size + 4 * count
+        for size in sizes:
+            block.append(data[position:position + size])
+            position += size
+
+        self._blocks[block_idx] = block
+        if len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+        return block
+
+    def _decompress(self, block_idx):
+        return zlib.decompressobj(zdict=self._zdict).decompress(self._span(block_idx))
+
+    def raw(self, idx):
+        """
+        Returns the undecoded bytes of record idx.
+        """
+        if self._blocks is not None:
+            block_idx, idx = divmod(idx, self._block_size)
+            return self._block(block_idx)[idx]
+        return self._span(idx)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self._count))]
+
+        if idx < 0:
+            idx += self._count
+        if not 0 <= idx < self._count:
+            raise IndexError("dataset index out of range")
+
+        return self._decode(self.raw(idx))
+
+    def __iter__(self):
+        if self._blocks is not None and self._decode is decode_record:
+            # Records are decoded straight from the decompressed block, without splitting it into
+            # records or going through the block cache, which is left to random accesses.
+            decoder = json.JSONDecoder()
+            for block_idx in range(self._nb_blocks):
+                data = self._decompress(block_idx)
+                count, = BLOCK_COUNT.unpack_from(data)
+                text = data[BLOCK_COUNT.size + 4 * count:].decode('utf-8')
+                end = 0
+                for _ in range(count):
+                    record, end = decoder.raw_decode(text, end)
+                    yield record
+            return
+
+        for idx in range(self._count):
+            yield self[idx]
+
+    def close(self):
+        self._mm.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a JSON TextWorldACG dataset to the binary format.")
+    parser.add_argument("json_file")
+    parser.add_argument("bin_file")
+    parser.add_argument("--compress", action="store_true",
+                        help="Write the compressed format (zlib blocks with a shared dictionary).")
+    args = parser.parse_args()
+
+    print("Wrote %d records to %s" % (json_to_binary(args.json_file, args.bin_file, args.compress), args.bin_file))
@@ -0,0 +1,70 @@
+import os
+import json
+import hashlib
+
+
+def options_key(options, **extra):
+    """
+    Key identifying a game by everything that determines it: the grammar flags, world size,
+    nb. of objects, quest length and breadth, seeds and anything passed in extra
+    (e.g. the challenge name).
+    """
+    spec = dict(extra)
+    spec["grammar"] = options.grammar.serialize()
+    spec["nb_rooms"] = options.nb_rooms
+    spec["nb_objects"] = options.nb_objects
+    spec["quest_length"] = [options.chaining.min_length, options.chaining.max_length]
+    spec["quest_breadth"] = [options.chaining.min_breadth, options.chaining.max_breadth]
+    spec["seeds"] = options.seeds
+    spec = json.dumps(spec, sort_keys=True, default=int)
+    return hashlib.sha1(spec.encode('utf-8')).hexdigest()
+
+
+class GameCache:
+    """
+    Manifest, kept next to the generated games, mapping game keys (see options_key)
+    to the .ulx/.json files they were compiled to. Like in the Catalog, paths are stored relative to
+    the games folder, so the manifest stays valid whatever directory it is read from.
+
+    Lookups see the entries of every manifest*.json in the folder (e.g. one per generation shard),
+    but the cache only ever writes to its own file_name.
+    """
+
+    def __init__(self, games_dir, file_name='manifest.json'):
+        self.games_dir = games_dir
+        self.file_name = os.path.join(games_dir, file_name)
+        self.entries = {}
+        self.own_entries = {}
+        if os.path.isdir(games_dir):
+            for name in sorted(os.listdir(games_dir)):
+                if name.startswith('manifest') and name.endswith('.json'):
+                    with open(os.path.join(games_dir, name)) as f:
+                        entries = json.load(f)
+                    self.entries.update(entries)
+                    if name == file_name:
+                        self.own_entries = entries
+
+    def get(self, key):
+        """
+        Returns the game file built for key, or None if it was never built or its files are gone.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        ulx_file, json_file = (os.path.join(self.games_dir, entry[ext]) for ext in ('ulx', 'json'))
+        if not (os.path.isfile(ulx_file) and os.path.isfile(json_file)):
+            return None
+        return ulx_file
+
+    def add(self, key, game_file):
+        ulx_file = os.path.relpath(game_file, self.games_dir)
+        self.entries[key] = self.own_entries[key] = {'ulx': ulx_file, 'json': os.path.splitext(ulx_file)[0] + '.json'}
+
+    def save(self):
+        if not os.path.isdir(os.path.dirname(self.file_name) or '.'):
+            os.makedirs(os.path.dirname(self.file_name))
+
+        tmp_file = self.file_name + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(self.own_entries, f)
+        os.replace(tmp_file, self.file_name)
@@ -0,0 +1,95 @@
+import os
+import re
+import json
+import operator
+
+OPERATORS = {'<=': operator.le, '>=': operator.ge, '==': operator.eq, '!=': operator.ne,
+             '<': operator.lt, '>': operator.gt}
+CONDITION = re.compile(r'^\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(.+?)\s*$')
+
+
+class Catalog:
+    """
+    Index of the generated games, kept next to them as JSON lines (one per game) with their uuid,
+    seed, world size, nb. of objects, quest length and the paths of their .ulx/.json files,
+    relative to the games folder. Games can then be listed and selected without touching their files.
+
+    Like GameCache, entries are read from every catalog*.jsonl in the folder (e.g. one per generation
+    shard) but only written to file_name. A game listed more than once keeps its last entry.
+    """
+
+    def __init__(self, games_dir, file_name='catalog.jsonl'):
+        self.games_dir = games_dir
+        self.file_name = os.path.join(games_dir, file_name)
+        self._file = None
+
+    def exists(self):
+        return bool(self._catalog_files())
+
+    def _catalog_files(self):
+        if not os.path.isdir(self.games_dir):
+            return []
+        return sorted(os.path.join(self.games_dir, name) for name in os.listdir(self.games_dir)
+                      if name.startswith('catalog') and name.endswith('.jsonl'))
+
+    def add(self, game_file, **infos):
+        """
+        Appends the entry of game_file (and its .json), with any infos given (seed, world_size...).
+        """
+        if self._file is None:
+            if not os.path.isdir(self.games_dir):
+                os.makedirs(self.games_dir)
+            self._file = open(self.file_name, 'a')
+
+        entry = dict(infos)
+        entry['ulx'] = os.path.relpath(game_file, self.games_dir)
+        entry['json'] = os.path.splitext(entry['ulx'])[0] + '.json'
+        self._file.write(json.dumps(entry, sort_keys=True, default=int) + '\n')
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def entries(self):
+        """
+        :return: all entries, with the ulx and json paths joined to the games folder
+        """
+        entries = {}
+        for file_name in self._catalog_files():
+            with open(file_name) as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break  # Partially written by an interrupted run.
+                    entry = json.loads(line)
+                    entries[entry['ulx']] = entry
+
+        for entry in entries.values():
+            entry['ulx'] = os.path.join(self.games_dir, entry['ulx'])
+            entry['json'] = os.path.join(self.games_dir, entry['json'])
+        return list(entries.values())
+
+
+def parse_condition(condition):
+    """
+    Turns a condition on a catalog field such as "quest_length>=5" or "world_size==3" into a
+    predicate on catalog entries. Values are read as JSON, or taken as strings if that fails.
+    """
+    match = CONDITION.match(condition)
+    if match is None:
+        raise ValueError("Invalid condition: {!r} (expected e.g. quest_length>=5)".format(condition))
+
+    field, op, value = match.groups()
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    compare = OPERATORS[op]
+
+    def predicate(entry):
+        return entry.get(field) is not None and compare(entry[field], value)
+    return predicate
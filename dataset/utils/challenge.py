@@ -21,15 +21,22 @@ Here's the map of the house.
 
 """
 
+import copy
+import json
+import threading
+from collections import defaultdict, OrderedDict
 from typing import Mapping, Union, Dict, Optional
 
 
 import textworld
 from textworld import GameOptions
+from textworld.generator.game import Quest, Event
 from textworld.logic import Proposition
 
 from textworld.utils import encode_seeds
 
+from .simulate import actions_from_commands
+
 
 def make_game_from_level(level: int, options: Optional[GameOptions] = None) -> textworld.Game:
     """ Make a Cooking game of the desired difficulty level.
@@ -57,7 +64,7 @@ def make_game_from_level(level: int, options: Optional[GameOptions] = None) -> t
     else:
         raise ValueError("Only level 1, 2 or 3 is supported for this game.")
 
-    return make_game(mode, options)
+    return make_game_from_template(mode, options)
 
 def make_game(mode: str, options: GameOptions) -> textworld.Game:
     """ Make a The Cook game.
@@ -73,16 +80,7 @@ def make_game(mode: str, options: GameOptions) -> textworld.Game:
     Returns:
         Generated game.
     """
-    metadata = {}  # Collect infos for reproducibility.
-    metadata["desc"] = "Cooking"
-    metadata["mode"] = mode
-    metadata["seeds"] = options.seeds
-    metadata["world_size"] = 6
-    metadata["quest_length"] = None  # TBD
-
     rngs = options.rngs
-    rng_map = rngs['map']
-    rng_objects = rngs['objects']
     rng_grammar = rngs['grammar']
     rng_quest = rngs['quest']
 
@@ -92,6 +90,94 @@ def make_game(mode: str, options: GameOptions) -> textworld.Game:
     M = textworld.GameMaker()
     M.grammar = textworld.generator.make_grammar(options.grammar, rng=rng_grammar)
 
+    house = _build_house(M)
+    _shuffle_food(house, rng_quest)
+
+    # The player starts in the bedroom.
+    M.set_player(house["bedroom"])
+
+    food, walkthrough = _make_walkthrough(M, house, rng_quest)
+    quest = M.set_quest_from_commands(walkthrough)
+    return _finish_game(M, house, food, quest, mode, options)
+
+
+def make_game_from_template(mode: str, options: GameOptions) -> textworld.Game:
+    """ Make a The Cook game from a copy of a prebuilt house.
+
+    Same game as :py:func:`make_game` for the same options, but the house and the grammar are
+    built once per process and copied for every game, and the quest is recorded on the game's
+    logic instead of compiling and playing the game. Only the options' RNGs are used, so games
+    can be generated concurrently.
+
+    Arguments:
+        mode: Mode for the game (see :py:func:`make_game`).
+        options:
+            For customizing the game generation (see
+            :py:class:`textworld.GameOptions <textworld.generator.game.GameOptions>`
+            for the list of available options).
+
+    Returns:
+        Generated game.
+    """
+    rngs = options.rngs
+    rng_quest = rngs['quest']
+
+    M, house = _copy_template()
+    M.grammar = _copy_grammar(options.grammar, rngs['grammar'])
+    _shuffle_food(house, rng_quest)
+
+    food, walkthrough = _make_walkthrough(M, house, rng_quest)
+
+    # Mirrors M.set_quest_from_commands, which builds the game once to compile it and once more
+    # after setting the quest (each build consumes the grammar's RNG).
+    game = M.build()
+    M.quests = [Quest(win_events=[Event(actions=actions_from_commands(game, walkthrough))])]
+    M.build()
+    return _finish_game(M, house, food, M.quests[-1], mode, options)
+
+
+_TEMPLATE = None
+_GRAMMARS = {}
+_LOCK = threading.Lock()
+
+
+def _copy_template():
+    """ Returns a copy of this process' prebuilt house, with the player in the bedroom. """
+    global _TEMPLATE
+    with _LOCK:
+        if _TEMPLATE is None:
+            # GameMaker builds a default grammar from the global RNG, hence the lock.
+            M = textworld.GameMaker()
+            house = _build_house(M)
+            M.set_player(house["bedroom"])
+            _TEMPLATE = M, house
+
+    M, house = _TEMPLATE
+    return copy.deepcopy((M, house), memo={id(M.grammar): M.grammar})
+
+
+def _copy_grammar(grammar_options, rng):
+    """ Returns a copy of the grammar built for grammar_options with its own RNG and no expansion used yet. """
+    key = json.dumps(grammar_options.serialize(), sort_keys=True)
+    with _LOCK:
+        if key not in _GRAMMARS:
+            _GRAMMARS[key] = textworld.generator.make_grammar(grammar_options, rng=rng)
+
+    # The grammar rules are shared, only the state changed by text generation is reset (see Grammar.__init__).
+    grammar = copy.copy(_GRAMMARS[key])
+    grammar.rng = rng
+    grammar.all_expansions = defaultdict(list)
+    grammar.overflow_dict = OrderedDict()
+    grammar.used_names = set(grammar.options.names_to_exclude)
+    return grammar
+
+
+def _build_house(M):
+    """ Builds the rooms, doors, furniture and food items, which are the same in every game.
+
+    Returns:
+        The entities the quest refers to, by name.
+    """
     # Start by building the layout of the world.
     bedroom = M.new_room("bedroom")
     kitchen = M.new_room("kitchen")
@@ -186,15 +272,28 @@ def make_game(mode: str, options: GameOptions) -> textworld.Game:
         food.add_property("edible")
         food.add_property("raw")
 
+    return {"bedroom": bedroom, "bedroom_kitchen": bedroom_kitchen, "drawer": drawer, "trunk": trunk,
+            "kitchen_island": kitchen_island, "foods": foods}
+
+
+def _shuffle_food(house, rng_quest):
     # Shuffle the position of the food items.
+    foods = house["foods"]
     food_names = [food.name for food in foods]
     rng_quest.shuffle(food_names)
     for food, name in zip(foods, food_names):
         food.orig_name = food.name
         food.name = name
 
-    # The player starts in the bedroom.
-    M.set_player(bedroom)
+
+def _make_walkthrough(M, house, rng_quest):
+    """ Hides the key, picks the food item to cook and writes the walkthrough.
+
+    Returns:
+        The food item and the walkthrough commands.
+    """
+    drawer, trunk = house["drawer"], house["trunk"]
+    bedroom_kitchen = house["bedroom_kitchen"]
 
     # Quest
     walkthrough = []
@@ -221,7 +320,7 @@ def make_game(mode: str, options: GameOptions) -> textworld.Game:
 
     # Part II - Find food item.
     # 1. Randomly pick a food item to cook.
-    food = rng_quest.choice(foods)
+    food = rng_quest.choice(house["foods"])
 
     # Retrieve the food item and get back in the kitchen.
     # HACK: handcrafting that part.
@@ -245,10 +344,19 @@ def make_game(mode: str, options: GameOptions) -> textworld.Game:
     walkthrough.append("cook {}".format(food.name))
     # walkthrough.append("eat {}".format(food.name))
 
+    return food, walkthrough
+
+
+def _finish_game(M, house, food, quest, mode, options):
+    metadata = {}  # Collect infos for reproducibility.
+    metadata["desc"] = "Cooking"
+    metadata["mode"] = mode
+    metadata["seeds"] = options.seeds
+    metadata["world_size"] = 6
+    metadata["quest_length"] = None  # TBD
+
     # 2. Determine the winning condition(s) of the game.
-    winning_conditions = [Proposition("cooked", [food.var])]
-    # quest = M.set_quest_from_final_state(winning_conditions)
-    quest = M.set_quest_from_commands(walkthrough)
+    # (The quest follows the walkthrough, see _make_walkthrough.)
 
     # 3. Determine the losing condition(s) of the game.
     quest.set_failing_conditions([Proposition("eaten", [food.var]),
@@ -258,7 +366,7 @@ def make_game(mode: str, options: GameOptions) -> textworld.Game:
     objective = "The dinner is almost ready! It's only missing a grilled {}."
     objective = objective.format(food.name)
     note = M.new(type='o', name='note', desc=objective)
-    kitchen_island.add(note)
+    house["kitchen_island"].add(note)
 
     game = M.build()
     if mode == "easy":
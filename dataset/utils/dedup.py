@@ -0,0 +1,218 @@
+"""
+Dedup indexes of TextWorldACG: where the state/action pairs being merged are kept, keyed by their state key
+(utils.parse.get_state_key).
+
+Every record is a pair [state, feedback, inventory, actions, entities, previous actions] and its accumulators
+(feedback counts, then the sets of actions, entities and previous actions already in the pair), which
+TextWorldACG.add_pair updates in place. MemoryIndex keeps everything in memory, DiskIndex keeps a bounded
+number of records in memory and the rest in a SQLite file. Once merging is over, freeze() drops the accumulators.
+"""
+import os
+import json
+import math
+import sqlite3
+from collections import OrderedDict
+
+
+class MemoryIndex:
+    """
+    Dedup index keeping every record in memory.
+    """
+
+    def __init__(self):
+        self.mappings = {}  # key -> (pair, accumulators)
+        self.pairs = []
+        # get(key) returns the (pair, accumulators) record of key, None if it isn't in the index.
+        # It is the dict's own method, add_pair calls it for every state walked.
+        self.get = self.mappings.get
+
+    def add(self, key, pair):
+        """
+        Adds a new pair, with empty accumulators.
+        :return: the (pair, accumulators) record
+        """
+        record = self.mappings[key] = (pair, ({}, set(), set(), set()))
+        self.pairs.append(pair)
+        return record
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def feedback_counts(self):
+        if self.mappings is None:
+            raise RuntimeError("The feedback counts of a frozen index are gone")
+        return [accumulators[0] for _, accumulators in self.mappings.values()]
+
+    def freeze(self):
+        """
+        Drops the keys and accumulators once merging is over, only keeping the pairs.
+        Nothing can be added to the index afterwards.
+        """
+        self.mappings = self.get = None
+
+    def close(self):
+        pass
+
+
+class BloomFilter:
+    """
+    Set of keys that may answer that a key is present when it isn't (at error_rate), but never the other way around.
+    Keys must be uniformly distributed bytes, like the digests of get_state_key: bit positions are
+    taken from the keys themselves rather than hashed again.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.nb_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.nb_hashes = max(1, round(self.nb_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.nb_bits + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing (Kirsch & Mitzenmacher) from the two halves of the key.
+        h1 = int.from_bytes(key[:8], 'little')
+        h2 = int.from_bytes(key[8:16], 'little') | 1
+        return [(h1 + i * h2) % self.nb_bits for i in range(self.nb_hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class DiskIndex:
+    """
+    Dedup index kept in a SQLite file, so that memory stays bounded however many states are parsed.
+
+    The cache_size most recently used records stay in memory, in an LRU cache in front of the database,
+    and are written back when they are evicted. A Bloom filter over the keys answers most lookups of new
+    states without querying the database. Deduplication stays exact: when the filter isn't sure, the
+    database is queried.
+
+    The file is a scratch file, rebuilt from scratch by every parse.
+    """
+
+    def __init__(self, file_name, cache_size=100000, capacity=10 ** 7, error_rate=0.01):
+        """
+        :param cache_size: nb. of records kept in memory (at least 1, the record being merged)
+        :param capacity: expected nb. of distinct states, to size the Bloom filter
+                         (more states only make it answer less often)
+        :param error_rate: rate of new states the Bloom filter can't tell apart from known ones at capacity
+        """
+        if cache_size < 1:
+            raise ValueError("cache_size must be at least 1, got %d" % cache_size)
+        self.file_name = file_name
+        self.cache_size = cache_size
+        if os.path.exists(file_name):
+            os.remove(file_name)
+        self._db = sqlite3.connect(file_name)
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE records (idx INTEGER PRIMARY KEY, key BLOB UNIQUE, pair TEXT, counts TEXT)")
+
+        self._cache = OrderedDict()  # key -> (idx, pair, accumulators)
+        self._dirty = set()
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._count = 0
+        self.pairs = DiskPairs(self)
+        self.lookups = 0  # Lookups that had to query the database.
+
+    def get(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            if key not in self._bloom:
+                return None
+            self.lookups += 1
+            row = self._db.execute("SELECT idx, pair, counts FROM records WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            entry = self._cache_entry(key, row[0], _decode_pair(row[1]), json.loads(row[2]))
+        else:
+            self._cache.move_to_end(key)
+        self._dirty.add(key)  # The caller merges into the record it gets.
+        return entry[1], entry[2]
+
+    def add(self, key, pair):
+        entry = self._cache_entry(key, self._count, pair, {})
+        self._count += 1
+        self._bloom.add(key)
+        self._dirty.add(key)
+        return entry[1], entry[2]
+
+    def _cache_entry(self, key, idx, pair, counts):
+        entry = (idx, pair, (counts, set(pair[3]), set(pair[4]), set(pair[5])))
+        self._cache[key] = entry
+        if len(self._cache) > self.cache_size:
+            # Evict a tenth of the cache at once, so that write-backs are batched.
+            evicted = [self._cache.popitem(last=False) for _ in range(max(1, self.cache_size // 10))]
+            self._write([(key, entry) for key, entry in evicted if key in self._dirty])
+        return entry
+
+    def _write(self, entries):
+        self._db.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)",
+                             [(idx, key, json.dumps(pair), json.dumps(accumulators[0]))
+                              for key, (idx, pair, accumulators) in entries])
+        self._db.commit()
+        self._dirty.difference_update(key for key, _ in entries)
+
+    def flush(self):
+        """
+        Writes back the records modified since they were last written.
+        """
+        if self._dirty:
+            self._write([(key, self._cache[key]) for key in self._dirty])
+
+    def __len__(self):
+        return self._count
+
+    def freeze(self):
+        """
+        Writes back and drops the records in memory and the Bloom filter once merging is over.
+        Pairs and feedback counts can still be read from the database, nothing can be added afterwards.
+        """
+        self.flush()
+        self._cache.clear()
+        self._bloom = None
+
+    def feedback_counts(self):
+        self.flush()
+        for counts, in self._db.execute("SELECT counts FROM records ORDER BY idx"):
+            yield json.loads(counts)
+
+    def close(self):
+        self._db.close()
+
+
+class DiskPairs:
+    """
+    Read-only, list-like view of the pairs of a DiskIndex, in the order they were added.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("dataset index out of range")
+
+        self.index.flush()
+        pair, = self.index._db.execute("SELECT pair FROM records WHERE idx=?", (idx,)).fetchone()
+        return _decode_pair(pair)
+
+    def __iter__(self):
+        self.index.flush()
+        for pair, in self.index._db.execute("SELECT pair FROM records ORDER BY idx"):
+            yield _decode_pair(pair)
+
+
+def _decode_pair(data):
+    pair = json.loads(data)
+    pair[4] = [tuple(ent) for ent in pair[4]]
+    return pair
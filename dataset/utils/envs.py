@@ -0,0 +1,113 @@
+import os
+import json
+from contextlib import contextmanager
+
+import textworld
+from textworld.envs.glulx.git_glulx_ml import GitGlulxMLEnvironment
+from textworld.generator.data import KnowledgeBase
+from textworld.generator.game import Game, Quest, EntityInfo
+from textworld.generator.text_grammar import Grammar
+from textworld.generator.world import World
+
+
+class EnvironmentPool:
+    """
+    Long-lived source of TextWorld environments for walking many games in one process.
+
+    A glulx interpreter can only run the story file it was started with, so every game
+    still gets its own interpreter process. What the pool amortizes is everything around it:
+    - environments are reused from game to game instead of being rebuilt,
+    - the game logic (KB) and grammar, which textworld.start re-parses from every game's
+      .json, are parsed once per distinct KB/grammar and shared between games,
+    - interpreters are killed and their message queues cleaned up as soon as a game is done,
+      even if walking it raised, so file descriptors stay flat over long runs.
+    """
+
+    def __init__(self, size=1):
+        """
+        :param size: number of idle environments kept around for reuse
+        """
+        self.size = size
+        self.games_served = 0
+        self._idle = []
+        self._kbs = {}
+        self._grammars = {}
+
+    def load_game(self, game_file):
+        """
+        Same as textworld's Game.load for the game's .json, but with the KB and grammar cached.
+        """
+        with open(os.path.splitext(game_file)[0] + ".json") as f:
+            data = json.load(f)
+
+        kb_key = (data["KB"]["logic"], data["KB"]["text_grammars_path"])
+        if kb_key not in self._kbs:
+            self._kbs[kb_key] = KnowledgeBase.deserialize(data["KB"])
+
+        grammar_key = json.dumps(data["grammar"], sort_keys=True)
+        if grammar_key not in self._grammars:
+            self._grammars[grammar_key] = Grammar(data["grammar"])
+
+        # Mirrors Game.deserialize.
+        game = Game(World.deserialize(data["world"]))
+        game.grammar = self._grammars[grammar_key]
+        game.quests = tuple([Quest.deserialize(d) for d in data["quests"]])
+        game._infos = {k: EntityInfo.deserialize(v) for k, v in data["infos"]}
+        game.kb = self._kbs[kb_key]
+        game.metadata = data.get("metadata", {})
+        game._objective = data.get("objective", None)
+        game.extras = data.get("extras", {})
+        if "main_quest" in data:
+            game.main_quest = Quest.deserialize(data["main_quest"])
+
+        return game
+
+    def _acquire(self, game_file):
+        if not game_file.endswith(".ulx"):
+            return textworld.start(game_file)  # Not a glulx game, nothing to reuse.
+
+        if self._idle:
+            env = self._idle.pop()
+        else:
+            env = GitGlulxMLEnvironment.__new__(GitGlulxMLEnvironment)
+            textworld.Environment.__init__(env)
+            env._process = None
+            env._compute_intermediate_reward = False
+
+        # Same state as a freshly started GitGlulxMLEnvironment (see its __init__).
+        env._gamefile = game_file
+        env._state_tracking = False
+        env.game = self.load_game(game_file)
+        env.game_state = None
+        env.extra_info = set()
+        return env
+
+    @contextmanager
+    def start(self, game_file):
+        """
+        Context manager yielding an environment for game_file, like textworld.start.
+        The environment is closed when leaving the block.
+        """
+        env = self._acquire(game_file)
+        try:
+            yield env
+        finally:
+            env.close()
+            self.games_served += 1
+            if isinstance(env, GitGlulxMLEnvironment):
+                env.__dict__.pop("_names_struct", None)  # Already cleaned up by close().
+                if len(self._idle) < self.size:
+                    self._idle.append(env)
+
+
+_POOL = None
+
+
+def get_environment_pool():
+    """
+    Returns this process' environment pool, so that it lives as long as the (worker) process.
+    """
+    global _POOL
+    if _POOL is None:
+        _POOL = EnvironmentPool()
+    return _POOL
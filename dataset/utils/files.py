@@ -1,9 +1,54 @@
 import os
+import random
 
-def get_games_list(games_dir='./gen_games/'):
-    ulx_files = []
-    for file in os.listdir(games_dir):
+from .cache import GameCache
+from .catalog import Catalog
+
+def get_games_list(games_dir='./gen_games/', where=(), sample=None, seed=0, shard_index=0, num_shards=1):
+    """
+    Returns the .ulx games in games_dir, sorted by file name so that every run (and every parse shard)
+    sees them in the same order. Games are listed from the folder's catalog if it has one, and by
+    scanning the folder and its subfolders otherwise. Games recorded in the folder's manifests but missing
+    from its catalog (e.g. built before the catalog existed) are reported, and kept unless where is given.
+    :param where: predicates on catalog entries (see utils.catalog.parse_condition) games must satisfy
+    :param sample: only keep this many games, drawn at random with seed
+    :param shard_index: only return the shard_index-th of num_shards contiguous slices of the games
+    """
+    catalog = Catalog(games_dir)
+    if catalog.exists():
+        all_entries = catalog.entries()
+        entries = [entry for entry in all_entries if all(predicate(entry) for predicate in where)]
+        ulx_files = [entry['ulx'] for entry in entries]
+        uncataloged = _uncataloged_games(games_dir, all_entries)
+        if uncataloged:
+            print("Warning: %d games of %s are in its manifests but not in its catalog (rerun sample_games.py "
+                  "to add them)%s" % (len(uncataloged), games_dir, ", they can't be selected" if where else ""))
+            if not where:
+                ulx_files += uncataloged
+    elif where:
+        raise ValueError("Selecting games needs a catalog, none found in %s" % games_dir)
+    else:
+        ulx_files = list(_scan_games(games_dir))
+
+    ulx_files.sort(key=lambda game: (os.path.basename(game), game))
+    if sample is not None and sample < len(ulx_files):
+        keep = set(random.Random(seed).sample(range(len(ulx_files)), sample))
+        ulx_files = [game for idx, game in enumerate(ulx_files) if idx in keep]
+    if num_shards > 1:
+        ulx_files = ulx_files[len(ulx_files) * shard_index // num_shards:
+                              len(ulx_files) * (shard_index + 1) // num_shards]
+    return ulx_files
+
+def _uncataloged_games(games_dir, entries):
+    cataloged = {os.path.normpath(entry['ulx']) for entry in entries}
+    cache = GameCache(games_dir)
+    games = (cache.get(key) for key in cache.entries)
+    return sorted(game for game in games if game is not None and os.path.normpath(game) not in cataloged)
+
+def _scan_games(games_dir):
+    for entry in os.scandir(games_dir):
+        if entry.is_dir():
+            yield from _scan_games(entry.path)
         # if file.startswith("tw-game") and file.endswith(".ulx"):
-        if file.endswith(".ulx"):
-            ulx_files.append(games_dir + file)
-    return ulx_files
\ No newline at end of file
+        elif entry.name.endswith(".ulx"):
+            yield os.path.join(games_dir, entry.name)
@@ -1,4 +1,14 @@
 import re
+import hashlib
+from functools import lru_cache
+
+DIRECTIONS = ['north', 'east', 'south', 'west']
+
+def get_state_key(state, inventory):
+    """
+    Fixed-size key identifying a state by its description and inventory.
+    """
+    return hashlib.blake2b((state + inventory).encode('utf-8'), digest_size=16).digest()
 
 def parse_game_state(game_state, EOS_token='<EOS>'):
     """
@@ -16,15 +26,53 @@ def parse_game_state(game_state, EOS_token='<EOS>'):
             actions.append(action_with_eos)
     return [state, inventory, actions]
 
+class EntityMatcher:
+    """
+    Finds all the entities and directions mentioned in a state in a single regex pass.
+    Build it once per game (or get a cached one with get_entity_matcher).
+    """
+
+    def __init__(self, all_entities):
+        self.entities = list(all_entities)
+        names = sorted(set(ent for ent, _ in self.entities), key=len, reverse=True)
+
+        # An entity that is a prefix of a longer one, followed by a non-word character,
+        # is found wherever the longer one is, but the alternation only reports the longest.
+        self._implied = {}
+        for name in names:
+            self._implied[name] = [other for other in names
+                                   if len(other) < len(name) and name.startswith(other)
+                                   and re.match(r'\W', name[len(other)])]
+
+        alternatives = [r'\b(' + '|'.join(DIRECTIONS) + r')\b']
+        if names:
+            alternatives.insert(0, r'\s(' + '|'.join(re.escape(name) for name in names) + r')\W')
+        self._regex = re.compile('(?=' + '|'.join(alternatives) + ')')
+        self._has_names = bool(names)
+
+    def match(self, state_input):
+        found_entities = set()
+        found_directions = set()
+        for match in self._regex.finditer(state_input):
+            name = match.group(1) if self._has_names else None
+            if name is not None:
+                found_entities.add(name)
+                found_entities.update(self._implied[name])
+            else:
+                found_directions.add(match.group(match.lastindex))
+
+        entities = [(ent, type) for ent, type in self.entities if ent in found_entities]
+        entities += [(direction, 'direction') for direction in DIRECTIONS if direction in found_directions]
+        return entities
+
+
+@lru_cache(maxsize=256)
+def get_entity_matcher(all_entities):
+    """
+    Returns a matcher for the given entities, shared between games with the same entities.
+    :param all_entities: tuple of (name, type) pairs
+    """
+    return EntityMatcher(all_entities)
+
 def get_state_entities(all_entities, state_input):
-    entities = []
-    for ent, type in all_entities:
-        reword = '\s' + ent + '\W'
-        regexp = re.compile(reword)
-        if regexp.search(state_input):
-            entities.append((ent, type))
-
-    for direction in ['north', 'east', 'south', 'west']:
-        if direction in state_input:
-            entities.append((direction, 'direction'))
-    return entities
\ No newline at end of file
+    return get_entity_matcher(tuple(all_entities)).match(state_input)
@@ -0,0 +1,111 @@
+import csv
+import json
+import time
+from collections import defaultdict
+
+PHASES = ['start', 'reset', 'parse', 'entities', 'merge', 'step', 'close', 'check']
+
+
+class WalkProfiler:
+    """
+    Per-game and per-phase timers and counters for parsing runs.
+
+    walk_game calls lap(phase) after each phase, which charges the time elapsed since the
+    previous lap to that phase. Callers keep a None profiler when instrumentation is off,
+    so a disabled profiler costs one `is not None` test per phase.
+    """
+
+    def __init__(self):
+        self.games = []
+        self.phase_times = defaultdict(float)
+        self.counters = defaultdict(int)
+        self._current = None
+        self._last = None
+
+    def start_game(self, game):
+        self._current = {'game': game, 'steps': 0, 'time': 0.0, 'phases': defaultdict(float)}
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self._current['phases'][phase] += now - self._last
+        self._last = now
+
+    def end_game(self, steps):
+        game = self._current
+        game['steps'] = steps
+        game['phases'] = dict(game['phases'])
+        game['time'] = sum(game['phases'].values())
+        for phase, elapsed in game['phases'].items():
+            self.phase_times[phase] += elapsed
+        self.counters['games'] += 1
+        self.counters['steps'] += steps
+        self.games.append(game)
+        self._current = None
+
+    def end_batch(self, nb_games, steps):
+        """
+        Like end_game, for nb_games walked in lockstep (see walk_games_batched): they share their phases,
+        so only the totals are counted and the batch adds no per-game timings.
+        """
+        for phase, elapsed in self._current['phases'].items():
+            self.phase_times[phase] += elapsed
+        self.counters['games'] += nb_games
+        self.counters['steps'] += steps
+        self._current = None
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def to_dict(self):
+        return {'games': self.games, 'phase_times': dict(self.phase_times), 'counters': dict(self.counters)}
+
+    def merge(self, profile):
+        """
+        Adds a profile produced by another profiler (e.g. in a parse worker, see to_dict).
+        """
+        self.games.extend(profile['games'])
+        for phase, elapsed in profile['phase_times'].items():
+            self.phase_times[phase] += elapsed
+        for name, value in profile['counters'].items():
+            self.counters[name] += value
+
+    def slowest_games(self, top=10):
+        return sorted(self.games, key=lambda game: game['time'], reverse=True)[:top]
+
+    def summary(self, nb_states=None, top=5):
+        """
+        :param nb_states: number of distinct states in the dataset, to report the dedup hit rate
+        """
+        total = sum(self.phase_times.values()) or 1e-9
+        steps = self.counters['steps']
+        lines = ["Parsed %d games, %d steps in %.1fs of walk time (%.1f steps/s)"
+                 % (self.counters['games'], steps, total, steps / total)]
+        for phase in sorted(self.phase_times, key=self.phase_times.get, reverse=True):
+            elapsed = self.phase_times[phase]
+            lines.append("  {:<10} {:>10.2f}s {:>6.1f}%".format(phase, elapsed, 100 * elapsed / total))
+
+        if nb_states is not None and steps:
+            lines.append("  dedup hit rate: %.1f%% (%d distinct states)" % (100 * (1 - nb_states / steps), nb_states))
+
+        if self.games:
+            lines.append("  slowest games:")
+        for game in self.slowest_games(top):
+            lines.append("    {:>8.2f}s {:>4d} steps  {}".format(game['time'], game['steps'], game['game']))
+        return "\n".join(lines)
+
+    def export(self, file_name):
+        """
+        Exports per-game timings, as CSV if file_name ends with .csv and as JSON otherwise.
+        """
+        if file_name.endswith('.csv'):
+            phases = PHASES + sorted(set(self.phase_times) - set(PHASES))
+            with open(file_name, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['game', 'steps', 'time'] + phases)
+                for game in self.games:
+                    writer.writerow([game['game'], game['steps'], game['time']]
+                                    + [game['phases'].get(phase, 0.0) for phase in phases])
+        else:
+            with open(file_name, 'w') as f:
+                json.dump(self.to_dict(), f)
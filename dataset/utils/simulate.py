@@ -0,0 +1,348 @@
+import re
+import copy
+from types import SimpleNamespace
+
+from textworld.generator.game import GameProgression
+from textworld.generator.inform7 import Inform7Game
+from textworld.generator.world import World
+
+# Inform7 conditionals, as produced by the text grammars: [if c_0 is open]..[else if ..]..[otherwise]..[end if]
+# Only matches innermost conditionals, nested ones are evaluated from the inside out.
+I7_CONDITIONAL = re.compile(r"\[[iI]f ([^\]]+)\]((?:(?!\[[iI]f ).)*?)\[end if\]", re.DOTALL)
+I7_BRANCH = re.compile(r"\[(else if [^\]]+|otherwise)\]")
+I7_TAG = re.compile(r"\[[^\]]*\]")
+# Lists of contents: [a list of things in the c_0], [list of things on the s_0], [is-are a list of things in the c_0]
+I7_LIST = re.compile(r"\[(is-are )?(a |the )?list of things (in|on) (?:the )?([^\]]+)\]")
+# Conditions on contents: "there is something on the s_0", "s_0 has something on it", "the s_0 is empty".
+I7_SOMETHING = re.compile(r"^there is (something|nothing) (in|on) (.+)$")
+I7_HAS_SOMETHING = re.compile(r"^(.+) has something (in|on) it$")
+I7_EMPTY = re.compile(r"^(.+) (?:contains nothing|is empty)$")
+I7_ARTICLE = re.compile(r"^(?:the|a|an) ")
+# Reports of the actions moving things around: TextWorld's for taking and dropping, Inform7's for the others.
+FEEDBACKS = {
+    "take": "You pick up the {noun} from the ground.",
+    "take/c": "You take the {noun} from the {holder}.",
+    "take/s": "You take the {noun} from the {holder}.",
+    "drop": "You drop the {noun} on the ground.",
+    "put": "You put the {noun} on the {holder}.",
+    "insert": "You put the {noun} into the {holder}.",
+    "eat": "You eat the {noun}. Not bad.",
+}
+# Texts of a game state cross_check compares.
+TEXT_FIELDS = ('state', 'inventory', 'feedback')
+
+
+class LogicEnvironment:
+    """
+    Stand-in for a TextWorld environment that plays a generated game on its logic state,
+    without compiling or running the story file.
+
+    Each step looks up the valid action whose command is the one given and applies it to a
+    GameProgression. Admissible commands are generated from the valid actions, the same way
+    TextWorld does when state tracking is on. Descriptions and inventories are rendered from
+    the rooms' and objects' grammar descriptions, evaluating their Inform7 conditions and lists of
+    contents on the logic state, and actions get TextWorld's or Inform7's standard reports. They
+    approximate what the interpreter prints (e.g. score notifications are not reproduced), which
+    utils.simulate.cross_check measures.
+
+    Unlike the glulx interpreter, it can snapshot and restore its state (get_state/set_state),
+    which agents.explore.ExplorationAgent uses to branch without replaying commands.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.inform7 = Inform7Game(game)
+        self.progression = None
+        self.game_state = None
+
+    # Same interface as textworld.Environment, walk_env calls these.
+    def enable_extra_info(self, info):
+        pass
+
+    def activate_state_tracking(self):
+        pass
+
+    def close(self):
+        self.progression = None
+
+    def reset(self):
+        self.progression = GameProgression(self.game)
+        self.game_state = self._game_state(feedback=self._describe_room())
+        return self.game_state
+
+    def step(self, command):
+        """
+        Applies command, if admissible. Like in the interpreter, other commands leave the state unchanged.
+        """
+        action = find_action(self.progression, self.inform7, command)
+        if action is None:
+            self.game_state = self._game_state(feedback="")
+        else:
+            self.progression.update(action)
+            self.game_state = self._game_state(feedback=self._feedback(action))
+        return self.game_state, self.game_state.score, self.game_state.done
+
+    def get_state(self):
+        """
+        :return: a snapshot of the game's progression, to be restored with set_state
+        """
+        return self._copy((self.progression, self.game_state))
+
+    def set_state(self, snapshot):
+        self.progression, self.game_state = self._copy(snapshot)
+
+    def _copy(self, obj):
+        # The game, its KB and its quests are shared by all snapshots, only the progression is copied.
+        memo = {id(self.game): self.game, id(self.game.kb): self.game.kb}
+        memo.update((id(quest), quest) for quest in self.game.quests)
+        return copy.deepcopy(obj, memo)
+
+    def _game_state(self, feedback):
+        actions = self.progression.valid_actions
+        return SimpleNamespace(
+            description=self._describe_room(),
+            inventory=self._describe_inventory(),
+            admissible_commands=sorted(set(self.inform7.gen_commands_from_actions(actions))),
+            feedback=feedback,
+            score=self.progression.score,
+            done=self.progression.done,
+        )
+
+    def _world(self):
+        return World.from_facts(self.progression.state.facts)
+
+    def _describe_room(self):
+        world = self._world()
+        room = world.player_room
+        infos = self.game.infos[room.id]
+        description = "-= {} =-\n{}".format(str.title(infos.name),
+                                             render_i7_text(infos.desc or "", self.progression.state, infos=self.game.infos))
+        # Like TextWorld's "printing the things on the floor" activity, after looking.
+        floor = [self.game.infos[obj.id] for obj in room.content if not self._is_a(obj.type, ["P", "c", "s", "d"])]
+        if floor:
+            description += "\n\nThere is {} on the floor.".format(list_names(floor))
+        return description
+
+    def _describe_inventory(self):
+        objects = self._world().get_objects_in_inventory()
+        if not objects:
+            return "You are carrying nothing."
+        names = ["{} {}".format(indefinite_article(self.game.infos[obj.id]), self.game.infos[obj.id].name)
+                 for obj in objects]
+        return "You are carrying:\n" + "\n".join("  " + name for name in names)
+
+    def _feedback(self, action):
+        """
+        What the interpreter prints after action: the room when moving or looking, the object's description
+        when examining, and TextWorld's or Inform7's standard report of the other actions.
+        """
+        if action.name == "look" or action.name.startswith("go/"):
+            return self._describe_room()
+        if action.name == "inventory":
+            return self._describe_inventory()
+        if action.name.startswith("examine/"):
+            for var in action.variables:
+                infos = self.game.infos.get(var.name)
+                if var.type not in ("P", "I", "r") and infos is not None and infos.desc:
+                    return render_i7_text(infos.desc, self.progression.state, subject=var.name, infos=self.game.infos)
+            return ""
+
+        # The thing acted upon (an object, key or food) and the container, supporter or door involved.
+        noun = holder = None
+        for var in action.variables:
+            if self._is_a(var.type, ["c", "s", "d"]):
+                holder = self.game.infos[var.name]
+            elif not self._is_a(var.type, ["P", "I", "r"]):
+                noun = self.game.infos[var.name]
+        verb = action.name.split("/")[0]
+        if verb in ("open", "close", "lock", "unlock"):
+            # Keys are the noun of lock/unlock, the container or door is what gets opened or locked.
+            feedback = "You {} the {}".format(verb, holder.name)
+            things = self._contents(holder.id) if verb == "open" and self._is_a(holder.type, "c") else []
+            return feedback + (", revealing {}.".format(list_names(things)) if things else ".")
+        report = FEEDBACKS.get(action.name)
+        if report is None or noun is None:
+            return ""
+        return report.format(noun=noun.name, holder=holder.name if holder is not None else "")
+
+    def _is_a(self, type, parents):
+        return self.game.kb.types.is_descendant_of(type, parents)
+
+    def _contents(self, holder):
+        return [self.game.infos[fact.arguments[0].name] for fact in self.progression.state.facts
+                if fact.name == "in" and fact.arguments[1].name == holder]
+
+
+def find_action(progression, inform7, command):
+    """
+    :return: the valid action of progression whose command is command, None if it isn't admissible
+    """
+    command = command.strip().lower()
+    actions = progression.valid_actions
+    for action, action_command in zip(actions, inform7.gen_commands_from_actions(actions)):
+        if action_command == command:
+            return action
+    return None
+
+
+def actions_from_commands(game, commands):
+    """
+    Replays commands from the game's initial state on its logic, like recording a playthrough
+    of the compiled game but without compiling it.
+    :raises ValueError: if a command is not admissible when it is played
+    :return: the actions the commands correspond to
+    """
+    progression = GameProgression(game, track_quests=False)
+    inform7 = Inform7Game(game)
+    actions = []
+    for command in commands:
+        action = find_action(progression, inform7, command)
+        if action is None:
+            raise ValueError("Command not admissible: {!r}".format(command))
+        progression.update(action)
+        actions.append(action)
+    return actions
+
+
+def render_i7_text(text, state, subject=None, infos=None):
+    """
+    Evaluates the Inform7 conditionals the text grammars put into descriptions against
+    the logic state, expands their lists of things in/on an object and strips all other Inform7 tags.
+    :param subject: entity id conditions without one (e.g. "[if open]") refer to
+    :param infos: the game's entity infos, for the names of the things listed
+                  (and of the entities conditions refer to by name rather than id)
+    """
+    infos = infos or {}
+    facts = {(fact.name, tuple(var.name for var in fact.arguments)) for fact in state.facts}
+    contents = {}  # (in|on, holder) -> ids of the things in/on it, in the order of the facts
+    for fact in state.facts:
+        if fact.name in ("in", "on") and len(fact.arguments) == 2:
+            contents.setdefault((fact.name, fact.arguments[1].name), []).append(fact.arguments[0].name)
+    ids_by_name = {entity.name: entity_id for entity_id, entity in infos.items() if entity.name}
+
+    def entity(name):
+        # Conditions use entity ids ("c_0"), or names ("the wooden chest") when the grammar put (name) in them.
+        name = I7_ARTICLE.sub("", name.strip())
+        return ids_by_name.get(name, name) if name != "name" else subject
+
+    def holds(condition):
+        condition = condition.strip()
+        if " and " in condition:
+            return all(holds(part) for part in condition.split(" and "))
+
+        # "there is something on the s_0", "s_0 has something on it", "c_0 contains nothing"...
+        match = I7_SOMETHING.match(condition)
+        if match is not None:
+            quantity, relation, name = match.groups()
+            return bool(contents.get((relation, entity(name)))) == (quantity == "something")
+        match = I7_HAS_SOMETHING.match(condition)
+        if match is not None:
+            name, relation = match.groups()
+            return bool(contents.get((relation, entity(name))))
+        match = I7_EMPTY.match(condition)
+        if match is not None:
+            name = entity(match.group(1))
+            return not contents.get(("in", name)) and not contents.get(("on", name))
+
+        # "c_0 is open" or, about the subject, "open".
+        name, _, attribute = condition.rpartition(" is ") if " is " in condition else condition.rpartition(" ")
+        return (attribute, (entity(name) if name else subject,)) in facts
+
+    def evaluate(match):
+        condition, body = match.group(1), match.group(2)
+        parts = I7_BRANCH.split(body)
+        # parts = [text, branch, text, branch, text, ...]
+        if holds(condition):
+            return parts[0]
+        for branch, text in zip(parts[1::2], parts[2::2]):
+            if branch == "otherwise" or holds(branch[len("else if "):]):
+                return text
+        return ""
+
+    def list_things(match):
+        is_are, article, relation, name = match.groups()
+        things = contents.get((relation, entity(name)), [])
+        listed = list_names([infos[thing] if thing in infos else thing for thing in things], article)
+        if is_are:
+            return ("are " if len(things) > 1 else "is ") + listed
+        return listed
+
+    # Object descriptions may leave their last conditional unterminated.
+    if text.lower().count("[if ") > text.count("[end if]"):
+        text += "[end if]"
+    nb_subs = 1
+    while nb_subs:
+        text, nb_subs = I7_CONDITIONAL.subn(evaluate, text)
+    text = I7_LIST.sub(list_things, text)
+    text = text.replace("[line break]", "\n")
+    return I7_TAG.sub("", text)
+
+
+def list_names(things, article="a "):
+    """
+    Lists things the way Inform7's "[a list of ...]" does: "a key, an apple and the coin", or "nothing".
+    :param things: entity infos (or names)
+    :param article: "a " for indefinite articles, "the " for definite ones, None for no article
+    """
+    if not things:
+        return "nothing"
+
+    names = []
+    for thing in things:
+        name = getattr(thing, "name", thing)
+        if article is None:
+            names.append(name)
+        elif article.strip().lower() == "the":
+            names.append("{} {}".format(getattr(thing, "definite", None) or "the", name))
+        else:
+            names.append("{} {}".format(indefinite_article(thing), name))
+    if len(names) == 1:
+        return names[0]
+    return ", ".join(names[:-1]) + " and " + names[-1]
+
+
+def indefinite_article(thing):
+    """
+    The article Inform7 prints before a thing: its own if the game gives one, "an" before a vowel, "a" otherwise.
+    """
+    article = getattr(thing, "indefinite", None)
+    if article:
+        return article
+    return "an" if getattr(thing, "name", thing)[:1].lower() in "aeiou" else "a"
+
+
+def cross_check(env, sim_env, commands):
+    """
+    Plays the same commands in lockstep in a real environment and a LogicEnvironment and
+    compares what a parse would record at each step: the admissible commands, and the state,
+    inventory and feedback texts (lowercased, on one line, as TextWorldACG stores them).
+    :return: the nb. of steps compared and the list of mismatches as (step, command,
+             commands only admissible in env, commands only admissible in sim_env,
+             names of the texts that differ)
+    """
+    env.activate_state_tracking()
+    game_state, sim_state = env.reset(), sim_env.reset()
+    mismatches = []
+    nb_steps = 0
+    for step, command in enumerate(commands):
+        nb_steps += 1
+        admissible, sim_admissible = set(game_state.admissible_commands), set(sim_state.admissible_commands)
+        texts = [field for field in TEXT_FIELDS
+                 if _parsed_text(game_state, field, step) != _parsed_text(sim_state, field, step)]
+        if admissible != sim_admissible or texts:
+            mismatches.append((step, command, sorted(admissible - sim_admissible),
+                               sorted(sim_admissible - admissible), texts))
+
+        game_state, _, done = env.step(command)
+        sim_state, _, sim_done = sim_env.step(command)
+        if done or sim_done:
+            break
+
+    return nb_steps, mismatches
+
+
+def _parsed_text(game_state, field, step):
+    if field == 'feedback' and step == 0:
+        return ''  # The first state's feedback isn't recorded.
+    text = game_state.description if field == 'state' else getattr(game_state, field)
+    return text.replace('\n', ' ').lower()
@@ -0,0 +1,227 @@
+import os
+import re
+import json
+import queue
+import random
+import threading
+from itertools import islice
+
+from .binary import BinaryDataset, is_binary_dataset
+from .tokenize import encode_pairs
+
+
+def read_json_pairs(file_name, chunk_size=1 << 20):
+    """
+    Yields the pairs of a JSON dataset (a list of pairs) one by one, without loading the whole list.
+    """
+    decoder = json.JSONDecoder()
+    separators = re.compile(r'[\s,]*')
+    with open(file_name) as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError("%s is not a JSON list of state/action pairs" % file_name)
+        pos = 1
+        eof = False
+        while True:
+            pos = separators.match(buffer, pos).end()
+            if buffer.startswith(']', pos):
+                return
+            try:
+                pair, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            yield pair
+            pos = end
+
+
+def read_shard_pairs(file_name, size=None):
+    """
+    Yields the pairs of a JSONL shard written by ShardWriter, reading at most size bytes.
+    Pairs are only deduplicated within the batch of games they were written with.
+    """
+    with open(file_name, 'rb') as f:
+        consumed = 0
+        for line in f:
+            consumed += len(line)
+            if size is not None and consumed > size:
+                break
+            yield from json.loads(line)['pairs']
+
+
+def read_shard_dir(shard_dir):
+    """
+    Yields the pairs of every shard of a ShardWriter directory, up to its last checkpoint.
+    Unlike ShardWriter, never modifies the directory, so it can be read while a parse is running.
+    """
+    with open(os.path.join(shard_dir, 'checkpoint.json')) as f:
+        checkpoint = json.load(f)
+    for name, size, _ in checkpoint['shards']:
+        yield from read_shard_pairs(os.path.join(shard_dir, name), size)
+
+
+def read_pairs(source, worker_index=0, num_workers=1):
+    """
+    Yields the pairs of a dataset file or shard directory, in order.
+    With num_workers > 1, only yields every num_workers-th pair, starting at worker_index,
+    so that workers reading the same source get disjoint parts of it.
+    """
+    if os.path.isdir(source):
+        pairs = read_shard_dir(source)
+    elif is_binary_dataset(source):
+        # Random access: only decode this worker's records.
+        dataset = BinaryDataset(source)
+        try:
+            if num_workers == 1:
+                yield from dataset
+            else:
+                yield from (dataset[idx] for idx in range(worker_index, len(dataset), num_workers))
+        finally:
+            dataset.close()
+        return
+    elif source.endswith('.jsonl'):
+        pairs = read_shard_pairs(source)
+    else:
+        pairs = read_json_pairs(source)
+    yield from islice(pairs, worker_index, None, num_workers)
+
+
+def collate_pairs(pairs):
+    """
+    Collates pairs into a batch of lists. The admissible actions of all pairs are concatenated into
+    `actions` and the actions of pair i are `actions[action_offsets[i]:action_offsets[i + 1]]`.
+    """
+    batch = {'state': [], 'feedback': [], 'inventory': [], 'entities': [], 'previous_actions': []}
+    actions = []
+    action_offsets = [0]
+    for state, feedback, inventory, pair_actions, entities, previous_actions in pairs:
+        batch['state'].append(state)
+        batch['feedback'].append(feedback)
+        batch['inventory'].append(inventory)
+        batch['entities'].append(entities)
+        batch['previous_actions'].append(previous_actions)
+        actions.extend(pair_actions)
+        action_offsets.append(len(actions))
+    batch['actions'] = actions
+    batch['action_offsets'] = action_offsets
+    return batch
+
+
+class StreamingDataset:
+    """
+    Iterable over batches of state/action pairs read sequentially from dataset files or shard directories.
+
+    A background thread reads the sources, shuffles pairs through a bounded buffer, collates
+    them into batches and keeps up to `prefetch` batches ready, so consumers don't wait on I/O.
+    Every iteration is a new epoch with its own shuffle order.
+
+    Shard directories and .jsonl shards are not deduplicated: a state reached by games of different
+    batches is yielded once per batch. Merge them with merge_shards.py first to stream deduplicated pairs.
+    """
+
+    def __init__(self, sources, batch_size=32, shuffle_buffer=10000, prefetch=8, seed=None,
+                 worker_index=0, num_workers=1, tokenizer=None, max_len=None, drop_last=False):
+        """
+        :param sources: dataset files (.json, .jsonl shards or .bin) and/or ShardWriter directories
+        :param shuffle_buffer: nb. of pairs kept in the buffer pairs are drawn from; 1 keeps the file order
+        :param prefetch: nb. of batches prepared in advance
+        :param worker_index: index of this consumer among num_workers, which all read disjoint pairs
+        :param tokenizer: if given, batches are encoded into NumPy arrays (see utils.tokenize.encode_pairs)
+                          instead of collated as text (see collate_pairs)
+        :param drop_last: drop the last batch if it is smaller than batch_size
+        """
+        if isinstance(sources, str):
+            sources = [sources]
+        if not 0 <= worker_index < num_workers:
+            raise ValueError("worker_index must be in [0, num_workers)")
+
+        self.sources = list(sources)
+        self.batch_size = batch_size
+        self.shuffle_buffer = max(1, shuffle_buffer)
+        self.prefetch = prefetch
+        self.seed = seed
+        self.worker_index = worker_index
+        self.num_workers = num_workers
+        self.tokenizer = tokenizer
+        self.max_len = max_len
+        self.drop_last = drop_last
+        self.epoch = 0
+
+    def collate(self, pairs):
+        if self.tokenizer is None:
+            return collate_pairs(pairs)
+        return encode_pairs(pairs, self.tokenizer, max_len=self.max_len, batch_size=len(pairs))
+
+    def pairs(self, rng):
+        """
+        Yields this worker's pairs, shuffled through the buffer.
+        """
+        buffer = []
+        for source in self.sources:
+            for pair in read_pairs(source, self.worker_index, self.num_workers):
+                if len(buffer) < self.shuffle_buffer:
+                    buffer.append(pair)
+                    continue
+                idx = rng.randrange(len(buffer))
+                buffer[idx], pair = pair, buffer[idx]
+                yield pair
+
+        rng.shuffle(buffer)
+        yield from buffer
+
+    def batches(self, rng):
+        batch = []
+        for pair in self.pairs(rng):
+            batch.append(pair)
+            if len(batch) == self.batch_size:
+                yield self.collate(batch)
+                batch = []
+        if batch and not self.drop_last:
+            yield self.collate(batch)
+
+    def __iter__(self):
+        seed = None if self.seed is None else (self.seed, self.epoch, self.worker_index)
+        rng = random.Random(str(seed) if seed is not None else None)
+        self.epoch += 1
+
+        batches = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        thread = threading.Thread(target=_produce, args=(self.batches(rng), batches, stop), daemon=True)
+        thread.start()
+        try:
+            while True:
+                kind, item = batches.get()
+                if kind == 'error':
+                    raise item
+                if kind == 'done':
+                    return
+                yield item
+        finally:
+            stop.set()
+            # Unblock the producer if it's waiting on a full queue.
+            while thread.is_alive():
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            thread.join()
+
+
+def _produce(batches, out, stop):
+    try:
+        for batch in batches:
+            while not stop.is_set():
+                try:
+                    out.put(('batch', batch), timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if stop.is_set():
+                return
+        out.put(('done', None))
+    except Exception as e:
+        out.put(('error', e))
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import pickle
+import select
+import signal
+import traceback
+
+
+class Supervisor:
+    """
+    Runs functions in a forked child process with a wall-clock limit, retrying them when they fail.
+
+    The child starts its own process group, so a timeout kills it together with whatever it started
+    (glulx interpreters, the Inform7 compiler). Forking directly rather than through multiprocessing
+    also works from inside pool workers, which can't have children of their own.
+    """
+
+    def __init__(self, timeout=60, retries=1):
+        """
+        :param timeout: seconds an attempt may take before it is killed
+        :param retries: nb. of times a failed attempt is retried
+        """
+        self.timeout = timeout
+        self.retries = retries
+
+    def run(self, fn, *args):
+        """
+        Calls fn(*args) in a child process. fn's result must be picklable.
+        :return: (result, None) on success, or (None, error message of the last attempt) if all attempts failed
+        """
+        error = None
+        for _ in range(1 + self.retries):
+            ok, value = self._attempt(fn, args)
+            if ok:
+                return value, None
+            error = value
+        return None, error
+
+    def _attempt(self, fn, args):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                os.setsid()
+                os.close(read_fd)
+                try:
+                    payload = (True, fn(*args))
+                except BaseException:
+                    payload = (False, traceback.format_exc(limit=5).strip().splitlines()[-1])
+                with os.fdopen(write_fd, 'wb') as f:
+                    pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except BaseException:
+                status = 1
+            finally:
+                os._exit(status)
+
+        os.close(write_fd)
+        chunks = []
+        deadline = time.monotonic() + self.timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False, "timed out after %ss" % self.timeout
+                ready, _, _ = select.select([read_fd], [], [], remaining)
+                if ready:
+                    chunk = os.read(read_fd, 1 << 20)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+        finally:
+            os.close(read_fd)
+            _kill(pid)
+
+        try:
+            return pickle.loads(b''.join(chunks))
+        except Exception:
+            return False, "process died without a result"
+
+
+def _kill(pid):
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    try:
+        os.waitpid(pid, 0)
+    except ChildProcessError:
+        pass
+
+
+class Quarantine:
+    """
+    Games (files or seeds) that kept failing, appended as JSON lines to file_name so later runs skip them.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.entries = {}
+        if file_name is not None and os.path.isfile(file_name):
+            with open(file_name) as f:
+                for line in f:
+                    if line.endswith('\n'):
+                        entry = json.loads(line)
+                        self.entries[entry['key']] = entry
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, key, error, **infos):
+        """
+        Quarantines key (a game file, the options key of a seed...) with the error it failed with and any infos given.
+        """
+        entry = dict(infos, key=key, error=error, time=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        self.entries[key] = entry
+        if self.file_name is not None:
+            directory = os.path.dirname(self.file_name)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(self.file_name, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
@@ -0,0 +1,173 @@
+import os
+import re
+import json
+import hashlib
+from collections import Counter
+
+import numpy as np
+
+PAD_TOKEN = '<PAD>'
+UNK_TOKEN = '<UNK>'
+EOS_TOKEN = '<EOS>'
+
+# Special tokens like <EOS> (added by parse_game_state) are kept whole.
+TOKEN_REGEX = re.compile(r"<[A-Z]+>|[\w'-]+|[^\w\s]")
+
+TEXT_FIELDS = ['state', 'feedback', 'inventory']
+
+
+def tokenize(text):
+    return TOKEN_REGEX.findall(text)
+
+
+class Tokenizer:
+    """
+    Word-level vocabulary mapping tokens to ids. Ids 0, 1 and 2 are <PAD>, <UNK> and <EOS>.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = list(tokens)
+        self.ids = {token: idx for idx, token in enumerate(self.tokens)}
+        self.unk_id = self.ids[UNK_TOKEN]
+
+    @classmethod
+    def build(cls, pairs, min_count=1, max_size=None):
+        """
+        Builds a vocabulary from the state, feedback, inventory and admissible actions of all pairs.
+        :param min_count: tokens seen fewer times are mapped to <UNK>
+        :param max_size: keep at most this many tokens (special tokens included)
+        """
+        counts = Counter()
+        for state, feedback, inventory, actions, _, _ in pairs:
+            for text in [state, feedback, inventory] + list(actions):
+                counts.update(tokenize(text))
+
+        specials = [PAD_TOKEN, UNK_TOKEN, EOS_TOKEN]
+        tokens = [token for token, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+                  if count >= min_count and token not in specials]
+        if max_size is not None:
+            tokens = tokens[:max_size - len(specials)]
+        return cls(specials + tokens)
+
+    @classmethod
+    def load(cls, file_name):
+        with open(file_name) as f:
+            return cls(json.load(f))
+
+    def save(self, file_name):
+        with open(file_name, 'w') as f:
+            json.dump(self.tokens, f)
+
+    @property
+    def fingerprint(self):
+        return hashlib.sha1(json.dumps(self.tokens).encode('utf-8')).hexdigest()
+
+    def encode(self, text):
+        return [self.ids.get(token, self.unk_id) for token in tokenize(text)]
+
+    def decode(self, ids):
+        return ' '.join(self.tokens[idx] for idx in ids if idx != 0)
+
+    def __len__(self):
+        return len(self.tokens)
+
+
+def _pad(sequences, max_len=None):
+    lengths = np.array([len(seq) for seq in sequences], dtype=np.int32)
+    if max_len is not None:
+        lengths = np.minimum(lengths, max_len)
+    width = int(lengths.max()) if len(lengths) else 0
+
+    padded = np.zeros((len(sequences), width), dtype=np.int32)
+    for row, (seq, length) in enumerate(zip(sequences, lengths)):
+        padded[row, :length] = seq[:length]
+    return padded, lengths
+
+
+def encode_pairs(pairs, tokenizer, max_len=None, batch_size=1024):
+    """
+    Encodes all pairs into NumPy arrays.
+
+    State, feedback and inventory become padded [N, T] int32 arrays (`<field>`) with their
+    `<field>_lengths`. Admissible actions are ragged: all actions of all pairs are padded
+    into `actions` [A, T] with `action_lengths`, and the actions of pair i are rows
+    `action_offsets[i]:action_offsets[i + 1]`.
+    """
+    encoded = {field: [] for field in TEXT_FIELDS}
+    actions = []
+    action_offsets = [0]
+
+    batch = []
+    for pair in pairs:
+        batch.append(pair)
+        if len(batch) == batch_size:
+            _encode_batch(batch, tokenizer, encoded, actions, action_offsets)
+            batch = []
+    _encode_batch(batch, tokenizer, encoded, actions, action_offsets)
+
+    arrays = {}
+    for field in TEXT_FIELDS:
+        arrays[field], arrays[field + '_lengths'] = _pad(encoded[field], max_len)
+    arrays['actions'], arrays['action_lengths'] = _pad(actions, max_len)
+    arrays['action_offsets'] = np.array(action_offsets, dtype=np.int64)
+    return arrays
+
+
+def _encode_batch(batch, tokenizer, encoded, actions, action_offsets):
+    encode = tokenizer.encode
+    for state, feedback, inventory, pair_actions, _, _ in batch:
+        encoded['state'].append(encode(state))
+        encoded['feedback'].append(encode(feedback))
+        encoded['inventory'].append(encode(inventory))
+        actions.extend(encode(action) for action in pair_actions)
+        action_offsets.append(len(actions))
+
+
+def file_fingerprint(file_name, chunk_size=1 << 20):
+    sha = hashlib.sha1()
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def pairs_fingerprint(pairs):
+    sha = hashlib.sha1()
+    for pair in pairs:
+        sha.update(json.dumps(list(pair)).encode('utf-8'))
+    return sha.hexdigest()
+
+
+def tokenize_dataset(pairs, cache_dir, tokenizer=None, dataset_hash=None, max_len=None, min_count=1):
+    """
+    Tokenizes a dataset, or loads it from cache_dir if it was already tokenized with the same
+    vocabulary. The cache file is keyed by the vocabulary and the dataset hash.
+    :param pairs: state/action pairs (e.g. TextWorldACG.state_action_pairs)
+    :param tokenizer: vocabulary to use. By default, one is built (or loaded from cache_dir) from the pairs
+    :param dataset_hash: hash of the dataset, e.g. file_fingerprint of its file. Computed from the pairs if missing
+    :return: the tokenizer and a dict of NumPy arrays (see encode_pairs)
+    """
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    if dataset_hash is None:
+        dataset_hash = pairs_fingerprint(pairs)
+
+    if tokenizer is None:
+        vocab_file = os.path.join(cache_dir, 'vocab-{}-{}.json'.format(dataset_hash[:16], min_count))
+        if os.path.isfile(vocab_file):
+            tokenizer = Tokenizer.load(vocab_file)
+        else:
+            tokenizer = Tokenizer.build(pairs, min_count=min_count)
+            tokenizer.save(vocab_file)
+
+    key = hashlib.sha1('{}-{}-{}'.format(tokenizer.fingerprint, dataset_hash, max_len).encode('utf-8'))
+    cache_file = os.path.join(cache_dir, 'tokens-{}.npz'.format(key.hexdigest()[:16]))
+    if os.path.isfile(cache_file):
+        with np.load(cache_file) as data:
+            return tokenizer, dict(data)
+
+    arrays = encode_pairs(pairs, tokenizer, max_len=max_len)
+    tmp_file = cache_file + '.tmp.npz'
+    np.savez(tmp_file, **arrays)
+    os.replace(tmp_file, cache_file)
+    return tokenizer, arrays
@@ -0,0 +1,116 @@
+from array import array
+
+from .binary import write_binary, write_compressed, INTERNED_ENCODING, encode_interned_record
+
+
+class Vocab:
+    """
+    Interning table giving every distinct item a consecutive integer id.
+    """
+
+    def __init__(self, items=()):
+        self.items = []
+        self.ids = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        """
+        Returns the id of item, adding it to the table if it is new.
+        """
+        idx = self.ids.get(item)
+        if idx is None:
+            idx = self.ids[item] = len(self.items)
+            self.items.append(item)
+        return idx
+
+    def __getitem__(self, idx):
+        return self.items[idx]
+
+    def __len__(self):
+        return len(self.items)
+
+
+class RaggedArray:
+    """
+    Sequence of variable-length integer arrays stored as one flat array plus offsets.
+    """
+
+    def __init__(self, typecode='I'):
+        self.values = array(typecode)
+        self.offsets = array('Q', [0])
+
+    def append(self, values):
+        self.values.extend(values)
+        self.offsets.append(len(self.values))
+
+    def __getitem__(self, idx):
+        return self.values[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class InternedPairs:
+    """
+    List-like store of state/action pairs. Admissible actions, entities and previous actions
+    live once in the actions/entities/commands vocab tables and every record only keeps
+    integer ids into them. Indexing still returns strings, like a list of pairs would.
+    """
+
+    def __init__(self, pairs=()):
+        self.actions = Vocab()
+        self.entities = Vocab()
+        self.commands = Vocab()
+
+        self._texts = []  # (state, feedback, inventory) per record
+        self._action_ids = RaggedArray()
+        self._entity_ids = RaggedArray()
+        self._command_ids = RaggedArray()
+        for pair in pairs:
+            self.append(pair)
+
+    def append(self, pair):
+        state, feedback, inventory, actions, entities, previous_actions = pair
+        self._texts.append((state, feedback, inventory))
+        self._action_ids.append(self.actions.add(action) for action in actions)
+        self._entity_ids.append(self.entities.add(tuple(entity)) for entity in entities)
+        self._command_ids.append(self.commands.add(command) for command in previous_actions)
+
+    def ids(self, idx):
+        """
+        Returns the action, entity and previous-action ids of record idx.
+        """
+        return self._action_ids[idx], self._entity_ids[idx], self._command_ids[idx]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        state, feedback, inventory = self._texts[idx]
+        action_ids, entity_ids, command_ids = self.ids(idx)
+        return [state, feedback, inventory,
+                [self.actions[i] for i in action_ids],
+                [self.entities[i] for i in entity_ids],
+                [self.commands[i] for i in command_ids]]
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def save(self, file_name, compress=False):
+        """
+        Saves the records in the binary format, with the vocab tables in its meta block.
+        :param compress: use the compressed binary format (see utils.binary.write_compressed)
+        """
+        meta = {'encoding': INTERNED_ENCODING,
+                'actions': self.actions.items,
+                'entities': self.entities.items,
+                'commands': self.commands.items}
+        records = ((self._texts[idx], self.ids(idx)) for idx in range(len(self)))
+        if compress:
+            return write_compressed(records, file_name, meta=meta, encode=encode_interned_record)
+        return write_binary(records, file_name, meta=meta, encode=encode_interned_record)
@@ -0,0 +1,114 @@
+import os
+import json
+
+
+class ShardWriter:
+    """
+    Appends parsed games to JSONL shards while the parse runs, and periodically checkpoints
+    which games are done so that an interrupted parse can pick up where it stopped.
+
+    Every line of a shard holds a batch of games, the state/action pairs parsed from them
+    (deduplicated within the batch only) and their feedback counts. Replaying the lines in order through
+    TextWorldACG.merge_pairs rebuilds the dataset, including its dedup index.
+    """
+
+    def __init__(self, shard_dir, shard_size=1000, checkpoint_every=100):
+        """
+        :param shard_dir: directory holding the shards and the checkpoint
+        :param shard_size: number of lines (batches of games) per shard
+        :param checkpoint_every: number of lines written between two checkpoints
+        """
+        self.shard_dir = shard_dir
+        self.shard_size = shard_size
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_file = os.path.join(shard_dir, 'checkpoint.json')
+
+        self.processed_games = []
+        self.shards = []  # [shard name, checkpointed size in bytes, nb. of lines]
+        self._file = None
+        self._since_checkpoint = 0
+
+        if not os.path.isdir(shard_dir):
+            os.makedirs(shard_dir)
+        self._load_checkpoint()
+
+    def _shard_path(self, name):
+        return os.path.join(self.shard_dir, name)
+
+    def _load_checkpoint(self):
+        if os.path.isfile(self.checkpoint_file):
+            with open(self.checkpoint_file) as f:
+                checkpoint = json.load(f)
+            self.processed_games = checkpoint['games']
+            self.shards = checkpoint['shards']
+
+        # Anything written after the last checkpoint may be partial, so it is dropped
+        # and those games get parsed again.
+        known = set(name for name, _, _ in self.shards)
+        for name, size, _ in self.shards:
+            with open(self._shard_path(name), 'r+b') as f:
+                f.truncate(size)
+        for name in os.listdir(self.shard_dir):
+            if name.startswith('shard-') and name not in known:
+                os.remove(self._shard_path(name))
+
+    def records(self):
+        """
+        Yields (games, state_action_pairs, feedback_counts) for every batch written so far, in order.
+        """
+        for name, _, _ in self.shards:
+            with open(self._shard_path(name)) as f:
+                for line in f:
+                    batch = json.loads(line)
+                    for pair in batch['pairs']:
+                        pair[4] = [tuple(ent) for ent in pair[4]]
+                    yield batch['games'], batch['pairs'], batch['feedback_counts']
+
+    def write(self, games, pairs, feedback_counts):
+        """
+        Appends one batch of games, the state/action pairs parsed from them and their feedback counts.
+        """
+        if self._file is None or self.shards[-1][2] >= self.shard_size:
+            self._open_shard()
+
+        batch = {'games': games, 'pairs': pairs, 'feedback_counts': feedback_counts}
+        self._file.write(json.dumps(batch) + '\n')
+        self.processed_games.extend(games)
+        self.shards[-1][2] += 1
+
+        self._since_checkpoint += 1
+        if self._since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def _open_shard(self):
+        if self._file is not None:
+            self.shards[-1][1] = self._file.tell()
+            self._file.close()
+
+        if self.shards and self.shards[-1][2] < self.shard_size:
+            name = self.shards[-1][0]  # Keep filling the last shard of a resumed run.
+        else:
+            name = 'shard-{:05d}.jsonl'.format(len(self.shards))
+            self.shards.append([name, 0, 0])
+        self._file = open(self._shard_path(name), 'a')
+
+    def checkpoint(self):
+        """
+        Flushes the current shard and records the processed games and shard sizes.
+        """
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.shards[-1][1] = self._file.tell()
+
+        tmp_file = self.checkpoint_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'games': self.processed_games, 'shards': self.shards}, f)
+        os.replace(tmp_file, self.checkpoint_file)
+        self._since_checkpoint = 0
+
+    def close(self):
+        self.checkpoint()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,11 +1,16 @@
+import os
 import sys
 import textworld
 import textworld.challenges
 import random
 import argparse
+import multiprocessing
 from tqdm import tqdm
 
 from dataset.utils import challenge
+from dataset.utils.cache import GameCache, options_key
+from dataset.utils.catalog import Catalog
+from dataset.utils.supervise import Quarantine, Supervisor
 
 
 def _get_available_challenges():
@@ -26,7 +31,7 @@ def exit_listing_challenges(challenge=None):
     print(msg)
     sys.exit(1)
 
-def parse_args():
+def parse_args(argv=None):
     general_parser = argparse.ArgumentParser(add_help=False)
 
     general_group = general_parser.add_argument_group('General settings')
@@ -34,6 +39,20 @@ def parse_args():
                                help="Path where to save the generated game.")
     general_group.add_argument('--seed', type=int, default=0)
     general_group.add_argument('--nb_games', type=int, default=2000)
+    general_group.add_argument('--workers', type=int, default=1, metavar="N",
+                               help="Nb. of processes generating games in parallel. Default: %(default)s")
+    general_group.add_argument('--shard_index', type=int, default=0, metavar="I",
+                               help="Only make the seeds of shard I out of --num_shards. Default: %(default)s")
+    general_group.add_argument('--num_shards', type=int, default=1, metavar="N",
+                               help="Nb. of shards (e.g. nodes) the seeds are split into. Default: %(default)s")
+    general_group.add_argument('--games_per_dir', type=int, default=0, metavar="N",
+                               help="Spread games over subfolders of the output, N seeds per subfolder. "
+                                    "Default: all games in the output folder")
+    general_group.add_argument('--timeout', type=float, metavar="SECONDS",
+                               help="Make every game in a child process killed after this many seconds. "
+                                    "Seeds that keep failing are quarantined and skipped by later runs.")
+    general_group.add_argument('--retries', type=int, default=1, metavar="N",
+                               help="With --timeout, nb. of times a failed seed is retried. Default: %(default)s")
 
     general_group.add_argument("--view", action="store_true",
                                help="Display the resulting game.")
@@ -73,44 +92,204 @@ def parse_args():
     challenge_parser.add_argument("challenge",
                                   help="Name of the builtin challenges, e.g. `tw-coin_collector-level210`")
 
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
-if __name__ == "__main__":
-    args = parse_args()
+def parse_challenge(name):
+    try:
+        _, challenge, level = name.split("-")
+    except:
+        exit_listing_challenges()
+
+    if challenge not in textworld.challenges.CHALLENGES:
+        exit_listing_challenges(name)
+
+    return challenge, int(level.lstrip("level"))
+
+def make_options(args, seed):
     options = textworld.GameOptions()
     options.grammar.theme = args.theme
     options.grammar.include_adj = args.include_adj
+    options.grammar.ambiguous_instructions = args.ambiguous_instructions
     options.grammar.only_last_action = args.only_last_action
     options.grammar.blend_instructions = args.blend_instructions
     options.grammar.blend_descriptions = args.blend_descriptions
-    options.grammar.ambiguous_instructions = args.ambiguous_instructions
+    options.path = os.path.join(game_dir(args, seed), "")
+    options.force_recompile = args.force
+    return options
 
-    if args.subcommand == "custom":
-        print("generating randomly generated games")
-        world_sizes = list(range(3, args.world_size))
-        nb_objects_list = list(range(8, args.nb_objects))
-        quest_lengths = list(range(5, args.quest_length))
+def custom_options(args, seed):
+    """
+    Options of one custom game. The world size, nb. of objects and quest length are drawn
+    from an RNG seeded with `seed`, so a game doesn't depend on which worker made it.
+    """
+    rng = random.Random(seed)
+    options = make_options(args, seed)
+    options.nb_rooms = rng.choice(range(3, args.world_size))
+    options.nb_objects = rng.choice(range(8, args.nb_objects))
+    options.quest_length = rng.choice(range(5, args.quest_length))
+    options.seeds = seed
+    return options
 
-        print("Making %d games in %s" % (args.nb_games, args.output))
-        for i in tqdm(range(args.seed, args.seed + args.nb_games + 1)):
-            options.nb_rooms = random.choice(world_sizes)
-            options.nb_objects = random.choice(nb_objects_list)
-            options.quest_length = random.choice(quest_lengths)
-            options.seeds = i
-            game_file, game = textworld.make(options)
-    elif args.subcommand == "challenge":
-        try:
-            _, challenge, level = args.challenge.split("-")
-        except:
-            exit_listing_challenges()
+def game_dir(args, seed):
+    """
+    Folder of the game made with `seed`: the output folder, or one of its subfolders with --games_per_dir.
+    """
+    if args.games_per_dir > 0:
+        return os.path.join(args.output, "{:05d}".format(seed // args.games_per_dir))
+    return args.output
+
+def make_custom_game(args, seed):
+    return textworld.make(custom_options(args, seed))
+
+def challenge_options(args, seed):
+    options = make_options(args, seed)
+    options.seeds = seed
+    return options
+
+def make_challenge_game(args, seed):
+    challenge, level = parse_challenge(args.challenge)
+    make_game = textworld.challenges.CHALLENGES[challenge]
+
+    options = challenge_options(args, seed)
+    game = make_game(level, options)
+    return textworld.generator.compile_game(game, options), game
+
+def game_info(seed, game):
+    """
+    Catalog entry of a game (see dataset.utils.catalog.Catalog).
+    """
+    quest = game.main_quest or (game.quests[0] if game.quests else None)
+    walkthrough = game.metadata.get("walkthrough") or (quest.commands if quest is not None else [])
+    return {"uuid": game.metadata.get("uuid"), "seed": seed, "world_size": len(game.world.rooms),
+            "nb_objects": len(game.world.objects), "quest_length": len(walkthrough)}
+
+GENERATORS = {
+    "custom": (custom_options, make_custom_game),
+    "challenge": (challenge_options, make_challenge_game),
+}
 
-        if challenge not in textworld.challenges.CHALLENGES:
-            exit_listing_challenges(args.challenge)
+def game_key(args, seed):
+    options_fn, _ = GENERATORS[args.subcommand]
+    return options_key(options_fn(args, seed), subcommand=args.subcommand,
+                       challenge=getattr(args, "challenge", None))
 
-        level = int(level.lstrip("level"))
-        make_game = textworld.challenges.CHALLENGES[challenge]
+def _make_game_info(make_fn, args, seed):
+    game_file, game = make_fn(args, seed)
+    return game_file, game_info(seed, game)
 
-        for i in tqdm(range(args.seed, args.seed + args.nb_games + 1)):
-            options.seeds = i
-            game = make_game(level, options)
-            game_file = textworld.generator.compile_game(game, args.output, force_recompile=args.force)
\ No newline at end of file
+def _make_one(job):
+    make_fn, args, seed, key = job
+    if args.timeout is not None:
+        # Supervised: a hung or crashing build (e.g. the Inform7 compiler) only costs this seed.
+        result, error = Supervisor(args.timeout, args.retries).run(_make_game_info, make_fn, args, seed)
+        if error is not None:
+            return seed, key, None, None, error
+        return (seed, key) + result + (None,)
+
+    try:
+        return (seed, key) + _make_game_info(make_fn, args, seed) + (None,)
+    except Exception as e:
+        return seed, key, None, None, "{}: {}".format(type(e).__name__, e)
+
+def backfill_catalog(args, cache, catalog, built):
+    """
+    Adds the games already built (seed, key) that the catalog doesn't list yet, e.g. games built
+    before the folder had a catalog, reading their infos from their .json file.
+    """
+    cataloged = {os.path.normpath(entry['ulx']) for entry in catalog.entries()}
+    missing = [(seed, key) for seed, key in built if os.path.normpath(cache.get(key)) not in cataloged]
+    if not missing:
+        return
+
+    print("Adding %d already built games to the catalog" % len(missing))
+    for seed, key in tqdm(missing):
+        game_file = cache.get(key)
+        game = textworld.Game.load(os.path.splitext(game_file)[0] + '.json')
+        catalog.add(game_file, key=key, subcommand=args.subcommand,
+                    challenge=getattr(args, "challenge", None), **game_info(seed, game))
+    catalog.flush()
+
+def make_games(args, save_every=100):
+    """
+    Makes a game for every seed, farming the seeds out to `args.workers` processes.
+    With --num_shards, only the seeds of shard --shard_index are made.
+    Every game made is added to the output's catalog (see dataset.utils.catalog), and so are
+    games already built that it doesn't list yet.
+    Games already listed in the output's manifests (with the same options) are skipped,
+    unless --force is given. Failures don't stop the run, they are reported once all seeds are done.
+    With --timeout, every seed is made under supervision (see dataset.utils.supervise) and the seeds that
+    failed are added to the output's quarantine, which later runs skip unless --force is given.
+    """
+    _, make_fn = GENERATORS[args.subcommand]
+    seeds = range(args.seed, args.seed + args.nb_games + 1)
+    manifest, catalog_file, quarantine_file = "manifest.json", "catalog.jsonl", "quarantine.jsonl"
+    if args.num_shards > 1:
+        # Shards take every num_shards-th seed and keep their own manifest and catalog,
+        # so they can share an output folder.
+        seeds = seeds[args.shard_index::args.num_shards]
+        manifest = "manifest-{}-of-{}.json".format(args.shard_index, args.num_shards)
+        catalog_file = "catalog-{}-of-{}.jsonl".format(args.shard_index, args.num_shards)
+        quarantine_file = "quarantine-{}-of-{}.jsonl".format(args.shard_index, args.num_shards)
+
+    cache = GameCache(args.output, manifest)
+    catalog = Catalog(args.output, catalog_file)
+    quarantine = Quarantine(os.path.join(args.output, quarantine_file)) if args.timeout is not None else None
+    jobs = []
+    built = []
+    quarantined = 0
+    for seed in seeds:
+        key = game_key(args, seed)
+        if not args.force and quarantine is not None and key in quarantine:
+            quarantined += 1
+        elif args.force or cache.get(key) is None:
+            jobs.append((make_fn, args, seed, key))
+        else:
+            built.append((seed, key))
+    print("%d games already built, making %d" % (len(built), len(jobs)))
+    backfill_catalog(args, cache, catalog, built)
+    if quarantined:
+        print("Skipping %d quarantined seeds (see %s)" % (quarantined, quarantine.file_name))
+
+    failures = []
+    pool = multiprocessing.Pool(args.workers) if args.workers > 1 else None
+    try:
+        results = pool.imap_unordered(_make_one, jobs) if pool is not None else map(_make_one, jobs)
+        for i, (seed, key, game_file, info, error) in enumerate(tqdm(results, total=len(jobs))):
+            if error is not None:
+                failures.append((seed, error))
+                if quarantine is not None:
+                    quarantine.add(key, error, seed=seed)
+                if args.verbose:
+                    tqdm.write("seed {}: {}".format(seed, error))
+            else:
+                cache.add(key, game_file)
+                catalog.add(game_file, key=key, subcommand=args.subcommand,
+                            challenge=getattr(args, "challenge", None), **info)
+
+            if (i + 1) % save_every == 0:
+                cache.save()
+                catalog.flush()
+    finally:
+        cache.save()
+        catalog.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    print("Made %d games, %d failed" % (len(jobs) - len(failures), len(failures)))
+    if failures and quarantine is not None:
+        print("Failed seeds quarantined in %s" % quarantine.file_name)
+    for seed, error in failures:
+        print("  seed {}: {}".format(seed, error))
+    return failures
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.subcommand == "custom":
+        print("generating randomly generated games")
+        print("Making %d games in %s" % (args.nb_games, args.output))
+        make_games(args)
+    elif args.subcommand == "challenge":
+        parse_challenge(args.challenge)
+        make_games(args)
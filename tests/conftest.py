@@ -0,0 +1,30 @@
+import os
+import sys
+import random
+
+import pytest
+
+# The dataset scripts import each other as top-level modules (see dataset/acg.py).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dataset'))
+
+WORDS = ['red', 'wooden', 'chest', 'key', 'door', 'kitchen', 'attic', 'lamp', 'table', 'apple']
+ACTIONS = ['take key', 'open chest', 'go north', 'go south', 'examine lamp', 'eat apple', 'put key on table']
+ENTITIES = [('key', 'o'), ('chest', 'c'), ('north', 'd'), ('table', 's'), ('kitchen', 'r')]
+
+
+def make_pair(rng, nb_states=20):
+    """
+    A random state/action pair, with states drawn among nb_states so that some of them repeat.
+    """
+    room = rng.randrange(nb_states)
+    state = "-= room {} =- you see a {} {}.".format(room, WORDS[room % len(WORDS)], WORDS[(room * 7) % len(WORDS)])
+    inventory = "you are carrying: " + ", ".join(WORDS[:room % 3])
+    feedback = rng.choice(['', 'you take the key.', 'you open the chest.', 'it is locked.'])
+    return [state, feedback, inventory, rng.sample(ACTIONS, rng.randint(1, 4)),
+            rng.sample(ENTITIES, rng.randint(0, 3)), rng.sample(ACTIONS, rng.randint(0, 3))]
+
+
+@pytest.fixture
+def pairs():
+    rng = random.Random(0)
+    return [make_pair(rng) for _ in range(300)]
@@ -0,0 +1,40 @@
+import random
+
+from acg import TextWorldACG
+from conftest import make_pair
+
+
+def test_add_pair_counts_feedback():
+    dataset = TextWorldACG.partial()
+    dataset.add_pair('room', 'you take the key.', 'nothing', ['open chest <EOS>'], [('key', 'o')], ['take key'])
+    dataset.add_pair('room', 'it is locked.', 'nothing', ['go north <EOS>', 'open chest <EOS>'],
+                     [('chest', 'c'), ('key', 'o')], ['open chest', 'take key'])
+    dataset.add_pair('room', 'you take the key.', 'nothing', [], [], ['take key', 'take key'])
+    dataset.add_pair('room', 'you take the key.', 'a key', [], [], [])
+
+    assert len(dataset) == 2
+    # A distinct feedback is prepended once, the others are only counted.
+    assert dataset[0] == ['room', 'it is locked.you take the key.', 'nothing', ['open chest <EOS>', 'go north <EOS>'],
+                          [('key', 'o'), ('chest', 'c')], ['take key', 'open chest']]
+    assert dataset.feedback_counts[0] == {'you take the key.': 2, 'it is locked.': 1}
+    assert dataset.feedback_counts[1] == {'you take the key.': 1}
+
+
+def test_merged_parses_match_a_serial_parse():
+    rng = random.Random(0)
+    pairs = [make_pair(rng) for _ in range(300)]
+
+    serial = TextWorldACG.partial()
+    for pair in pairs:
+        serial.add_pair(*pair)
+
+    merged = TextWorldACG.partial()
+    for chunk in (pairs[:100], pairs[100:250], pairs[250:]):
+        worker = TextWorldACG.partial()
+        for pair in chunk:
+            worker.add_pair(*pair)
+        merged.merge_pairs(worker.state_action_pairs, worker.feedback_counts)
+
+    assert len(serial) < len(pairs)
+    assert merged.state_action_pairs == serial.state_action_pairs
+    assert merged.feedback_counts == serial.feedback_counts
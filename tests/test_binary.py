@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from reader import load_pairs
+from utils.binary import BinaryDataset, json_to_binary, write_binary, write_compressed
+from utils.vocab import InternedPairs
+
+
+def normalized(pairs):
+    # JSON records give entities back as lists, interned ones as tuples.
+    return [pair[:4] + [[tuple(ent) for ent in pair[4]], pair[5]] for pair in pairs]
+
+
+def test_binary_round_trip(tmp_path, pairs):
+    file_name = str(tmp_path / 'dataset.bin')
+    assert write_binary(pairs, file_name) == len(pairs)
+
+    dataset = BinaryDataset(file_name)
+    assert len(dataset) == len(pairs)
+    assert normalized(dataset) == normalized(pairs)
+    assert normalized([dataset[-1]]) == normalized([pairs[-1]])
+    assert normalized(dataset[10:20]) == normalized(pairs[10:20])
+    with pytest.raises(IndexError):
+        dataset[len(pairs)]
+    dataset.close()
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 64, 1000])
+def test_compressed_round_trip(tmp_path, pairs, block_size):
+    file_name = str(tmp_path / 'dataset.zbin')
+    assert write_compressed(pairs, file_name, block_size=block_size, sample_size=50) == len(pairs)
+
+    dataset = BinaryDataset(file_name, cache_blocks=2)
+    assert len(dataset) == len(pairs)
+    assert normalized(dataset) == normalized(pairs)
+    # Random accesses go through the block cache rather than the in-order decoding.
+    for idx in [0, len(pairs) - 1, block_size, 3, block_size * 2 + 1, -2]:
+        if -len(pairs) <= idx < len(pairs):
+            assert normalized([dataset[idx]]) == normalized([pairs[idx]])
+    dataset.close()
+
+
+@pytest.mark.parametrize('extension', ['.bin', '.zbin'])
+def test_interned_round_trip(tmp_path, pairs, extension):
+    interned = InternedPairs(pairs)
+    assert normalized(interned) == normalized(pairs)
+    assert len(interned.actions) < sum(len(pair[3]) for pair in pairs)
+
+    file_name = str(tmp_path / ('dataset' + extension))
+    interned.save(file_name, compress=extension == '.zbin')
+    dataset = BinaryDataset(file_name)
+    assert dataset.meta['encoding'] == 'interned'
+    assert list(dataset) == normalized(pairs)
+    assert dataset[5] == normalized(pairs)[5]
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_json_to_binary(tmp_path, pairs, compress):
+    json_file, bin_file = str(tmp_path / 'dataset.json'), str(tmp_path / 'dataset.bin')
+    with open(json_file, 'w') as f:
+        json.dump(pairs, f)
+
+    assert json_to_binary(json_file, bin_file, compress=compress) == len(pairs)
+    assert normalized(load_pairs(bin_file)) == normalized(load_pairs(json_file))
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from utils.cache import GameCache
+from utils.catalog import Catalog, parse_condition
+from utils.files import get_games_list
+
+
+def make_game(games_dir, name):
+    game_file = os.path.join(games_dir, name)
+    os.makedirs(os.path.dirname(game_file), exist_ok=True)
+    for ext in ('.ulx', '.json'):
+        open(os.path.splitext(game_file)[0] + ext, 'w').close()
+    return game_file
+
+
+def test_parse_condition():
+    entry = {'quest_length': 5, 'world_size': 3, 'challenge': 'cooking', 'seed': None}
+    assert parse_condition('quest_length>=5')(entry)
+    assert not parse_condition('quest_length > 5')(entry)
+    assert parse_condition(' world_size == 3 ')(entry)
+    assert parse_condition('world_size!=4')(entry)
+    assert parse_condition('world_size<4')(entry) and parse_condition('world_size<=3')(entry)
+    # Values that aren't JSON are strings.
+    assert parse_condition('challenge==cooking')(entry)
+    assert parse_condition('challenge=="cooking"')(entry)
+    # Entries without the field (or without a value for it) never match.
+    assert not parse_condition('nb_objects>=0')(entry)
+    assert not parse_condition('seed!=1')(entry)
+
+    for condition in ['quest_length', 'quest_length=>5', '>=5', 'quest length>=5']:
+        with pytest.raises(ValueError):
+            parse_condition(condition)
+
+
+def test_catalog_entries(tmp_path):
+    games_dir = str(tmp_path / 'games')
+    catalog = Catalog(games_dir)
+    assert not catalog.exists()
+    catalog.add(make_game(games_dir, 'a/game-1.ulx'), seed=1, quest_length=3)
+    catalog.add(make_game(games_dir, 'game-2.ulx'), seed=2, quest_length=5)
+    catalog.add(os.path.join(games_dir, 'game-2.ulx'), seed=2, quest_length=6)
+    catalog.close()
+
+    # Paths are relative to the games folder, other shards' catalogs are read too and the last entry of a game wins.
+    with open(os.path.join(games_dir, 'catalog.jsonl')) as f:
+        assert '"ulx": "a/game-1.ulx"' in f.read()
+    shard = Catalog(games_dir, file_name='catalog-1.jsonl')
+    shard.add(make_game(games_dir, 'game-3.ulx'), seed=3, quest_length=7)
+    shard.close()
+    # A line left partial by an interrupted run is ignored.
+    with open(os.path.join(games_dir, 'catalog-1.jsonl'), 'a') as f:
+        f.write('{"ulx": "game-4.ulx", "se')
+
+    entries = sorted(Catalog(games_dir).entries(), key=lambda entry: entry['seed'])
+    assert [entry['seed'] for entry in entries] == [1, 2, 3]
+    assert [entry['quest_length'] for entry in entries] == [3, 6, 7]
+    assert entries[0]['ulx'] == os.path.join(games_dir, 'a/game-1.ulx')
+    assert entries[0]['json'] == os.path.join(games_dir, 'a/game-1.json')
+
+
+def test_games_list_selects_from_the_catalog(tmp_path):
+    games_dir = str(tmp_path / 'games')
+    catalog = Catalog(games_dir)
+    for seed in range(6):
+        catalog.add(make_game(games_dir, 'game-%d.ulx' % seed), seed=seed, quest_length=seed % 3)
+    catalog.close()
+
+    where = [parse_condition('quest_length>=1')]
+    assert get_games_list(games_dir, where=where) == \
+        [os.path.join(games_dir, 'game-%d.ulx' % seed) for seed in (1, 2, 4, 5)]
+    assert len(get_games_list(games_dir)) == 6
+    with pytest.raises(ValueError):
+        get_games_list(str(tmp_path / 'empty'), where=where)
+
+
+def test_games_list_keeps_uncataloged_games(tmp_path, capsys):
+    games_dir = str(tmp_path / 'games')
+    catalog = Catalog(games_dir)
+    catalog.add(make_game(games_dir, 'game-1.ulx'), quest_length=1)
+    catalog.close()
+    cache = GameCache(games_dir)
+    cache.add('key-1', os.path.join(games_dir, 'game-1.ulx'))
+    cache.add('key-2', make_game(games_dir, 'game-2.ulx'))
+    cache.save()
+
+    assert get_games_list(games_dir) == [os.path.join(games_dir, 'game-%d.ulx' % seed) for seed in (1, 2)]
+    assert "1 games" in capsys.readouterr().out
+    assert get_games_list(games_dir, where=[parse_condition('quest_length>=0')]) == \
+        [os.path.join(games_dir, 'game-1.ulx')]
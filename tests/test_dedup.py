@@ -0,0 +1,58 @@
+import os
+import random
+
+import pytest
+
+from acg import TextWorldACG
+from conftest import make_pair
+from utils.dedup import BloomFilter, DiskIndex, MemoryIndex
+from utils.parse import get_state_key
+
+
+def parse(index, pairs):
+    dataset = TextWorldACG.partial()
+    dataset.index = index
+    dataset.state_action_pairs = index.pairs
+    for pair in pairs:
+        dataset.add_pair(*pair)
+    return dataset
+
+
+@pytest.mark.parametrize('cache_size', [1, 2, 10, 1000])
+def test_disk_index_matches_memory_index(tmp_path, cache_size):
+    rng = random.Random(cache_size)
+    pairs = [make_pair(rng, nb_states=50) for _ in range(500)]
+
+    in_memory = parse(MemoryIndex(), pairs)
+    on_disk = parse(DiskIndex(str(tmp_path / 'index.sqlite'), cache_size=cache_size, capacity=100), pairs)
+    assert len(on_disk) == len(in_memory) < len(pairs)
+    assert list(on_disk.state_action_pairs) == in_memory.state_action_pairs
+    assert list(on_disk.feedback_counts) == in_memory.feedback_counts
+    assert on_disk.state_action_pairs[-1] == in_memory.state_action_pairs[-1]
+    assert on_disk.state_action_pairs[3:6] == in_memory.state_action_pairs[3:6]
+
+    on_disk.index.freeze()
+    in_memory.index.freeze()
+    assert list(on_disk.state_action_pairs) == in_memory.state_action_pairs
+    on_disk.index.close()
+
+
+def test_disk_index_needs_a_cache(tmp_path):
+    with pytest.raises(ValueError):
+        DiskIndex(str(tmp_path / 'index.sqlite'), cache_size=0)
+
+
+def test_disk_index_starts_from_scratch(tmp_path):
+    file_name = str(tmp_path / 'index.sqlite')
+    parse(DiskIndex(file_name), [make_pair(random.Random(0))]).index.close()
+    assert os.path.isfile(file_name)
+    assert len(DiskIndex(file_name)) == 0
+
+
+def test_bloom_filter_has_no_false_negatives():
+    keys = [get_state_key('state %d' % i, '') for i in range(2000)]
+    bloom = BloomFilter(capacity=1000)
+    for key in keys[:1000]:
+        bloom.add(key)
+    assert all(key in bloom for key in keys[:1000])
+    assert sum(key in bloom for key in keys[1000:]) < 50
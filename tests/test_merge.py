@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from acg import TextWorldACG
+from conftest import make_pair
+from merge_shards import merge_shard_dirs
+from utils.writer import ShardWriter
+
+GAMES = ['game-%03d.ulx' % i for i in range(24)]
+
+
+def walk(games):
+    """
+    Stands in for a parse worker walking games: a partial dataset of random pairs per game.
+    """
+    partial = TextWorldACG.partial()
+    for game in games:
+        rng = random.Random(game)
+        for _ in range(6):
+            partial.add_pair(*make_pair(rng))
+    return partial
+
+
+def parse_shards(tmp_path, num_shards, batch_size=3):
+    """
+    Writes the games the way acg.py --num_shards does: shard I gets the I-th contiguous slice of the games.
+    """
+    shard_dirs = []
+    for shard_index in range(num_shards):
+        games = GAMES[len(GAMES) * shard_index // num_shards:len(GAMES) * (shard_index + 1) // num_shards]
+        shard_dir = str(tmp_path / ('%d-of-%d' % (shard_index, num_shards)))
+        writer = ShardWriter(shard_dir, checkpoint_every=2)
+        for i in range(0, len(games), batch_size):
+            partial = walk(games[i:i + batch_size])
+            writer.write(games[i:i + batch_size], partial.state_action_pairs, partial.feedback_counts)
+        writer.close()
+        shard_dirs.append(shard_dir)
+    return shard_dirs
+
+
+def test_merge_same_for_any_number_of_shards(tmp_path):
+    single = walk(GAMES)
+    for num_shards in (1, 2, 3, 5):
+        # Directories are given in any order.
+        merged = merge_shard_dirs(parse_shards(tmp_path, num_shards)[::-1])
+        assert merged.state_action_pairs == single.state_action_pairs
+        assert merged.feedback_counts == single.feedback_counts
+
+
+def test_merge_skips_games_merged_twice(tmp_path):
+    shard_dirs = parse_shards(tmp_path, 2)
+    merged = merge_shard_dirs(shard_dirs + shard_dirs[:1])
+    assert merged.state_action_pairs == walk(GAMES).state_action_pairs
+
+
+@pytest.mark.parametrize('index_cache', [1, 5])
+def test_merge_through_disk_index(tmp_path, index_cache):
+    shard_dirs = parse_shards(tmp_path, 3)
+    in_memory = merge_shard_dirs(shard_dirs)
+    on_disk = merge_shard_dirs(shard_dirs, index_file=str(tmp_path / 'index.sqlite'), index_cache=index_cache)
+    assert list(on_disk.state_action_pairs) == in_memory.state_action_pairs
+    assert list(on_disk.feedback_counts) == in_memory.feedback_counts
@@ -0,0 +1,44 @@
+import re
+import random
+
+from utils.parse import DIRECTIONS, EntityMatcher, get_state_entities
+
+ENTITIES = [('red key', 'k'), ('red key ring', 'o'), ('key', 'k'), ('chest', 'c'), ('chest-of-drawers', 's'),
+            ('keyboard', 'o'), ('c++ book', 'o'), ('kitchen', 'r')]
+
+
+def reference_entities(all_entities, state_input):
+    # One search per entity, like get_state_entities did before the matcher.
+    entities = [(ent, type) for ent, type in all_entities if re.search(r'\s' + re.escape(ent) + r'\W', state_input)]
+    entities += [(direction, 'direction') for direction in DIRECTIONS if re.search(r'\b' + direction + r'\b', state_input)]
+    return entities
+
+
+def test_prefixes_are_implied():
+    matcher = EntityMatcher(ENTITIES)
+    assert matcher._implied['red key ring'] == ['red key']
+    assert matcher._implied['chest-of-drawers'] == ['chest']
+    # "key" is a prefix of "keyboard", but not followed by a non-word character.
+    assert matcher._implied['keyboard'] == []
+
+    # Every position is tried, so "key" is also found inside "red key ring".
+    assert matcher.match(' you see a red key ring.') == [('red key', 'k'), ('red key ring', 'o'), ('key', 'k')]
+    assert matcher.match(' there is a chest-of-drawers here.') == [('chest', 'c'), ('chest-of-drawers', 's')]
+    assert matcher.match(' you see a keyboard.') == [('keyboard', 'o')]
+    assert matcher.match(' a c++ book and a key.') == [('key', 'k'), ('c++ book', 'o')]
+
+
+def test_directions_on_word_boundaries():
+    matcher = EntityMatcher(ENTITIES)
+    assert matcher.match(' an exit to the north. ') == [('north', 'direction')]
+    assert matcher.match(' the northern wall, facing west-south.') == [('south', 'direction'), ('west', 'direction')]
+    assert matcher.match(' the eastward path.') == []
+    assert EntityMatcher([]).match(' go east or south.') == [('east', 'direction'), ('south', 'direction')]
+
+
+def test_same_as_one_search_per_entity():
+    rng = random.Random(0)
+    words = [ent for ent, _ in ENTITIES] + DIRECTIONS + ['northern', 'a', 'the', 'keys', 'chests', '.', ',', '-']
+    for _ in range(500):
+        state_input = ' ' + ' '.join(rng.choice(words) for _ in range(rng.randint(1, 12))) + ' '
+        assert get_state_entities(ENTITIES, state_input) == reference_entities(ENTITIES, state_input)
@@ -0,0 +1,21 @@
+from utils.profiling import WalkProfiler
+
+
+def test_batches_only_count_towards_the_totals():
+    profiler = WalkProfiler()
+    profiler.start_game('game-1.ulx')
+    profiler.lap('reset')
+    profiler.end_game(3)
+    profiler.start_game('game-2.ulx game-3.ulx')
+    profiler.lap('reset')
+    profiler.lap('step')
+    profiler.end_batch(2, 7)
+
+    assert profiler.counters == {'games': 3, 'steps': 10}
+    assert [game['game'] for game in profiler.games] == ['game-1.ulx']
+    assert set(profiler.phase_times) == {'reset', 'step'}
+    assert "Parsed 3 games, 10 steps" in profiler.summary()
+
+    merged = WalkProfiler()
+    merged.merge(profiler.to_dict())
+    assert merged.counters == profiler.counters and len(merged.games) == 1
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('textworld')
+
+from utils.simulate import render_i7_text
+
+INFOS = {
+    'c_0': SimpleNamespace(name='wooden chest', indefinite=None, definite=None),
+    's_0': SimpleNamespace(name='table', indefinite=None, definite=None),
+    'o_0': SimpleNamespace(name='key', indefinite=None, definite=None),
+    'f_0': SimpleNamespace(name='apple', indefinite=None, definite=None),
+    'o_1': SimpleNamespace(name='coin', indefinite='some', definite=None),
+}
+
+# Templates of house_room.twg, with (obj) and (name) filled in like the grammar does.
+SUPPORTER = ("[if there is something on the s_0]On the table you see [a list of things on the s_0].[end if]"
+             "[if there is nothing on the s_0]The table is empty.[end if]")
+SUPPORTER_NAME = "The table is bare[if name has something on it] on the table [a list of things on the s_0]" \
+                 "[else if the table is empty], nothing on it[end if]."
+CONTAINER = ("The chest is [if c_0 is locked]locked[else if c_0 is open]open[otherwise]closed[end if]."
+             "[if c_0 is open and there is something in the c_0] It holds [a list of things in the c_0].[end if]"
+             "[if c_0 is open and the c_0 contains nothing] It is empty.[end if]")
+LIST_WITH_IS = "Inside there [is-are a list of things in the c_0]."
+
+
+def state(*facts):
+    return SimpleNamespace(facts=[SimpleNamespace(name=name, arguments=[SimpleNamespace(name=arg) for arg in args])
+                                  for name, *args in facts])
+
+
+def render(text, *facts, subject=None):
+    return render_i7_text(text, state(*facts), subject=subject, infos=INFOS)
+
+
+def test_supporter():
+    assert render(SUPPORTER) == "The table is empty."
+    assert render(SUPPORTER, ('on', 'o_0', 's_0')) == "On the table you see a key."
+    assert render(SUPPORTER, ('on', 'o_0', 's_0'), ('on', 'f_0', 's_0'), ('on', 'o_1', 's_0')) == \
+        "On the table you see a key, an apple and some coin."
+    # Things elsewhere are not on the table.
+    assert render(SUPPORTER, ('in', 'o_0', 'c_0')) == "The table is empty."
+
+
+def test_supporter_by_name():
+    assert render(SUPPORTER_NAME, subject='s_0') == "The table is bare, nothing on it."
+    assert render(SUPPORTER_NAME, ('on', 'f_0', 's_0'), subject='s_0') == "The table is bare on the table an apple."
+
+
+def test_container():
+    assert render(CONTAINER, ('closed', 'c_0'), ('in', 'o_0', 'c_0')) == "The chest is closed."
+    assert render(CONTAINER, ('locked', 'c_0')) == "The chest is locked."
+    assert render(CONTAINER, ('open', 'c_0')) == "The chest is open. It is empty."
+    assert render(CONTAINER, ('open', 'c_0'), ('in', 'o_0', 'c_0')) == "The chest is open. It holds a key."
+
+
+def test_list_with_is():
+    assert render(LIST_WITH_IS, ('in', 'f_0', 'c_0')) == "Inside there is an apple."
+    assert render(LIST_WITH_IS, ('in', 'f_0', 'c_0'), ('in', 'o_0', 'c_0')) == "Inside there are an apple and a key."
+    assert render(LIST_WITH_IS) == "Inside there is nothing."
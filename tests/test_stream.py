@@ -0,0 +1,20 @@
+from test_writer import make_batches
+from utils.stream import read_shard_dir
+from utils.writer import ShardWriter
+
+
+def as_lists(pairs):
+    return [pair[:4] + [[list(ent) for ent in pair[4]], pair[5]] for pair in pairs]
+
+
+def test_read_shard_dir_stops_at_the_checkpoint(tmp_path):
+    batches = make_batches(8)
+    writer = ShardWriter(str(tmp_path), shard_size=3, checkpoint_every=2)
+    for batch in batches[:7]:
+        writer.write(*batch)
+    # A parse still running: a batch written after the last checkpoint and one being written.
+    writer._file.write('{"games": ["game-999.ulx"], "pai')
+    writer._file.flush()
+
+    expected = [pair for _, pairs, _ in batches[:6] for pair in pairs]
+    assert as_lists(read_shard_dir(str(tmp_path))) == as_lists(expected)
@@ -0,0 +1,90 @@
+import os
+import time
+import subprocess
+
+from utils.supervise import Quarantine, Supervisor
+
+
+def add(a, b):
+    return a + b
+
+
+def fail():
+    raise ValueError("broken game")
+
+
+def start_and_hang(pid_file):
+    # Like a glulx interpreter the walked game started, the grandchild must be killed too.
+    process = subprocess.Popen(['sleep', '60'])
+    with open(pid_file, 'w') as f:
+        f.write(str(process.pid))
+    time.sleep(60)
+
+
+def fail_once(attempts_file):
+    # Attempts run in their own processes, so they count through a file.
+    with open(attempts_file, 'a') as f:
+        f.write('.')
+    with open(attempts_file) as f:
+        if len(f.read()) == 1:
+            raise RuntimeError("first attempt")
+    return 'done'
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A zombie whose parent hasn't reaped it yet is dead too.
+    try:
+        with open('/proc/%d/stat' % pid) as f:
+            return f.read().split(') ')[-1][0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def test_supervisor_returns_results_and_errors():
+    supervisor = Supervisor(timeout=10, retries=0)
+    assert supervisor.run(add, 1, 2) == (3, None)
+    assert supervisor.run(fail) == (None, "ValueError: broken game")
+
+
+def test_supervisor_kills_on_timeout(tmp_path):
+    pid_file = str(tmp_path / 'pid')
+    start = time.monotonic()
+    result, error = Supervisor(timeout=1, retries=0).run(start_and_hang, pid_file)
+    assert time.monotonic() - start < 10
+    assert result is None and error == "timed out after 1s"
+    with open(pid_file) as f:
+        pid = int(f.read())
+    time.sleep(0.2)
+    assert not is_alive(pid)
+
+
+def test_supervisor_retries(tmp_path):
+    attempts_file = str(tmp_path / 'attempts')
+    assert Supervisor(timeout=10, retries=1).run(fail_once, attempts_file) == ('done', None)
+    with open(attempts_file) as f:
+        assert f.read() == '..'
+
+    os.remove(attempts_file)
+    assert Supervisor(timeout=10, retries=0).run(fail_once, attempts_file) == (None, "RuntimeError: first attempt")
+
+
+def test_quarantine(tmp_path):
+    file_name = str(tmp_path / 'out' / 'quarantine.jsonl')
+    quarantine = Quarantine(file_name)
+    quarantine.add('game-001.ulx', "timed out after 1s")
+    quarantine.add(42, "ValueError: broken game", seed=42)
+    assert len(quarantine) == 2 and 'game-001.ulx' in quarantine
+
+    # An interrupted write leaves a partial line, which is ignored.
+    with open(file_name, 'a') as f:
+        f.write('{"key": "game-002.ulx", "err')
+    reloaded = Quarantine(file_name)
+    assert len(reloaded) == 2
+    assert 'game-001.ulx' in reloaded and 42 in reloaded and 'game-002.ulx' not in reloaded
+    assert reloaded.entries[42]['seed'] == 42
+
+    assert len(Quarantine(None)) == 0
@@ -0,0 +1,60 @@
+import os
+import random
+
+from conftest import make_pair
+from utils.writer import ShardWriter
+
+
+def make_batches(nb_batches, seed=0):
+    rng = random.Random(seed)
+    return [(['game-%03d.ulx' % i], [make_pair(rng) for _ in range(5)], [{'': 1}] * 5) for i in range(nb_batches)]
+
+
+def as_lists(records):
+    return [(games, [pair[:4] + [[list(ent) for ent in pair[4]], pair[5]] for pair in pairs], counts)
+            for games, pairs, counts in records]
+
+
+def test_records_in_order(tmp_path):
+    batches = make_batches(7)
+    writer = ShardWriter(str(tmp_path), shard_size=3, checkpoint_every=2)
+    for batch in batches:
+        writer.write(*batch)
+    writer.close()
+
+    assert sorted(name for name in os.listdir(str(tmp_path)) if name.startswith('shard-')) == \
+        ['shard-00000.jsonl', 'shard-00001.jsonl', 'shard-00002.jsonl']
+    reopened = ShardWriter(str(tmp_path))
+    assert reopened.processed_games == [games[0] for games, _, _ in batches]
+    assert as_lists(reopened.records()) == as_lists(batches)
+
+
+def test_resume_after_truncation(tmp_path):
+    batches = make_batches(10)
+    writer = ShardWriter(str(tmp_path), shard_size=4, checkpoint_every=3)
+    for batch in batches[:8]:
+        writer.write(*batch)
+    # Crash: the last 2 batches were written after the last checkpoint, the last one only partially.
+    writer._file.write('{"games": ["game-999.ulx"], "pai')
+    writer._file.flush()
+
+    resumed = ShardWriter(str(tmp_path), shard_size=4, checkpoint_every=3)
+    assert resumed.processed_games == [games[0] for games, _, _ in batches[:6]]
+    assert as_lists(resumed.records()) == as_lists(batches[:6])
+
+    for batch in batches[6:]:
+        resumed.write(*batch)
+    resumed.close()
+    assert as_lists(ShardWriter(str(tmp_path)).records()) == as_lists(batches)
+
+
+def test_resume_drops_uncheckpointed_shards(tmp_path):
+    batches = make_batches(6)
+    writer = ShardWriter(str(tmp_path), shard_size=2, checkpoint_every=3)
+    for batch in batches[:5]:
+        writer.write(*batch)
+    writer._file.flush()
+
+    resumed = ShardWriter(str(tmp_path), shard_size=2)
+    assert as_lists(resumed.records()) == as_lists(batches[:3])
+    assert not os.path.exists(str(tmp_path / 'shard-00002.jsonl'))